@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional
+
+from db_manager import DatabaseManager
+
+
+# 修改數據庫的方法，都在同一個寫線程上按提交順序執行
+WRITE_METHODS = {
+    "init_database", "rebuild_search_index", "save_setting", "add_app_info_translation",
+    "add_language", "add_translation", "add_event_type", "delete_event_type",
+    "add_template", "restore_template_revision", "delete_template", "delete_template_by_name",
+    "rename_event_type", "move_template", "rename_template",
+    "import_templates", "add_templates_bulk", "merge_templates", "migrate_from_json",
+    "set_pragma_profile",
+}
+# 不轉發的方法：連接由執行器線程自行管理，生成器方法單獨實現
+_EXCLUDED_METHODS = {"get_connection", "release_connection", "close_connection", "iter_templates"}
+
+
+class AsyncDatabaseManager:
+    """DatabaseManager 的 asyncio 接口
+
+    公開方法與 DatabaseManager 相同，但都返回可等待對象。調用在專用線程池中執行，
+    每個線程使用連接池中自己的連接，不阻塞事件循環：
+    寫入方法在單個寫線程上按調用順序執行，讀取方法在讀線程池中並行執行。
+    等待寫入完成後發起的讀取一定能看到該寫入。
+
+    取消尚未開始的調用時直接丟棄；取消正在執行的調用時中斷其當前 SQL 語句，
+    DatabaseManager 的方法會回滾事務，調用方收到 CancelledError。
+    進度回調等參數在執行器線程中調用。
+    """
+
+    def __init__(self, db_file: str = 'data/app.db', read_workers: int = 2, **kwargs):
+        """初始化並在寫線程上打開數據庫（包括執行遷移），不阻塞調用方
+
+        Args:
+            db_file (str): 數據庫文件路徑
+            read_workers (int): 讀線程數量
+            **kwargs: 傳給 DatabaseManager 的其他參數
+        """
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-read")
+        # 連接數上限需容納寫線程、讀線程和同時進行的幾個 iter_templates 線程
+        kwargs.setdefault("max_connections", read_workers + 4)
+        self._db_future = self._writer.submit(DatabaseManager, db_file, **kwargs)
+        self._methods = {}
+        self._closed = False
+
+    @property
+    def db_manager(self) -> DatabaseManager:
+        """底層的 DatabaseManager，數據庫尚未打開時阻塞等待"""
+        return self._db_future.result()
+
+    async def open(self) -> "AsyncDatabaseManager":
+        """等待數據庫打開完成，打開失敗時拋出異常"""
+        await asyncio.wrap_future(self._db_future)
+        return self
+
+    async def close(self):
+        """等待已提交的調用完成後關閉執行器和所有連接"""
+        if self._closed:
+            return
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        if self._db_future.exception() is None:
+            self._db_future.result().close_connection()
+
+    async def __aenter__(self) -> "AsyncDatabaseManager":
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    def __getattr__(self, name: str):
+        """把 DatabaseManager 的公開方法包裝為協程函數"""
+        if name.startswith("_") or name in _EXCLUDED_METHODS or not callable(getattr(DatabaseManager, name, None)):
+            raise AttributeError(f"{type(self).__name__} has no attribute '{name}'")
+        method = self._methods.get(name)
+        if method is None:
+            executor = self._writer if name in WRITE_METHODS else self._readers
+
+            @functools.wraps(getattr(DatabaseManager, name))
+            async def method(*args, **kwargs):
+                return await self._run(executor, name, args, kwargs)
+
+            self._methods[name] = method
+        return method
+
+    async def _run(self, executor: ThreadPoolExecutor, name: str, args: tuple, kwargs: Dict) -> Any:
+        """在執行器中調用 DatabaseManager 的方法，支持取消"""
+        if self._closed:
+            raise RuntimeError("AsyncDatabaseManager is closed")
+        # running 時記錄執行線程的連接，取消時用它中斷；鎖保證不會中斷到下一個調用
+        state = {"conn": None, "done": False, "cancelled": False}
+        lock = threading.Lock()
+
+        def call():
+            db_manager = self._db_future.result()
+            with lock:
+                if state["cancelled"]:
+                    return None
+                state["conn"] = db_manager.get_connection()
+            try:
+                return getattr(db_manager, name)(*args, **kwargs)
+            finally:
+                with lock:
+                    state["done"] = True
+
+        future = executor.submit(call)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            with lock:
+                state["cancelled"] = True
+                if state["conn"] is not None and not state["done"]:
+                    state["conn"].interrupt()
+            raise
+
+    async def iter_templates(self, event_type: Optional[str] = None, tag: Optional[str] = None,
+                             batch_size: int = 100) -> AsyncIterator[Dict]:
+        """異步逐個返回模板，每次讀取一批
+
+        整個迭代在專屬的線程上執行：游標屬於該線程的連接，不會被讀線程池中的其他調用使用，
+        其他調用被取消時的中斷也不會影響迭代。迭代本身被取消時只中斷這個連接。
+
+        Args:
+            event_type (str, optional): 只返回該事件類型的模板
+            tag (str, optional): 只返回該標籤的模板
+            batch_size (int): 每批讀取的模板數量
+
+        Yields:
+            Dict: 與 DatabaseManager.iter_templates 相同的模板字典
+        """
+        if self._closed:
+            raise RuntimeError("AsyncDatabaseManager is closed")
+        db_manager = await asyncio.wrap_future(self._db_future)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-iter")
+        templates = db_manager.iter_templates(event_type, tag, batch_size)
+
+        def next_batch():
+            return list(itertools.islice(templates, batch_size))
+
+        def finish():
+            templates.close()
+            # 歸還迭代線程的連接，線程結束後不再佔用連接池
+            db_manager.release_connection()
+
+        try:
+            conn = await asyncio.wrap_future(executor.submit(db_manager.get_connection))
+            while True:
+                future = executor.submit(next_batch)
+                try:
+                    batch = await asyncio.wrap_future(future)
+                except asyncio.CancelledError:
+                    if not future.done():
+                        conn.interrupt()
+                    raise
+                if not batch:
+                    break
+                for template in batch:
+                    yield template
+        finally:
+            try:
+                await asyncio.wrap_future(executor.submit(finish))
+            finally:
+                executor.shutdown(wait=False)
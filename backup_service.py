@@ -0,0 +1,199 @@
+import os
+import re
+import gzip
+import time
+import shutil
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+
+# 備份文件名：app_backup_<時間戳>.db，壓縮後為 .db.gz
+BACKUP_PREFIX = "app_backup_"
+_BACKUP_FILE_PATTERN = re.compile(rf'^{BACKUP_PREFIX}\d{{8}}_\d{{6}}(_\d+)?\.db(\.gz)?$')
+
+
+class BackupService:
+    """基於 SQLite 在線備份接口的數據庫備份服務
+
+    按頁分步複製，步驟之間釋放讀鎖，備份期間其他連接仍可寫入；
+    若源數據庫在備份過程中被修改，SQLite 會自動重新開始，得到的始終是一致的快照。
+    """
+
+    def __init__(self, db_file: str, backup_dir: Optional[str] = None, keep: int = 5,
+                 pages_per_step: int = 256, compress: bool = False, max_restarts: int = 3):
+        """初始化備份服務
+
+        Args:
+            db_file (str): 要備份的數據庫文件
+            backup_dir (str, optional): 默認備份目錄，默認為數據庫所在目錄下的 backups
+            keep (int): 默認備份目錄中保留的最近備份數量，0 表示不清理；
+                備份到其他目錄（如用戶手動選擇的文件夾）時從不清理，以免刪除用戶原有的備份
+            pages_per_step (int): 每步複製的頁數，越小越少阻塞寫入
+            compress (bool): 是否默認使用 gzip 壓縮備份
+            max_restarts (int): 分步備份因寫入而重啟的最大次數，超過後一次性複製
+        """
+        self.db_file = db_file
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(os.path.abspath(db_file)), "backups")
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.compress = compress
+        self.max_restarts = max_restarts
+        self._lock = threading.Lock()
+
+    def backup(self, target_dir: Optional[str] = None, compress: Optional[bool] = None,
+               progress_callback: Optional[Callable[[int, int], None]] = None) -> str:
+        """執行一次備份（同步）
+
+        Args:
+            target_dir (str, optional): 備份目錄，默認使用 backup_dir
+            compress (bool, optional): 是否壓縮，默認使用初始化時的設置
+            progress_callback (Callable, optional): 進度回調，參數為 (已複製頁數, 總頁數)
+
+        Returns:
+            str: 備份文件路徑
+        """
+        target_dir = target_dir or self.backup_dir
+        compress = self.compress if compress is None else compress
+        os.makedirs(target_dir, exist_ok=True)
+
+        # 同一時間只執行一個備份
+        with self._lock:
+            backup_file = self._new_backup_path(target_dir, compress)
+            # 先寫入臨時文件，完成後再改名，未完成的備份不會被當作有效備份
+            temp_file = backup_file + ".tmp"
+            try:
+                if compress:
+                    raw_file = backup_file + ".raw"
+                    try:
+                        self._copy_database(raw_file, progress_callback)
+                        with open(raw_file, 'rb') as src, gzip.open(temp_file, 'wb') as dst:
+                            shutil.copyfileobj(src, dst, 1024 * 1024)
+                    finally:
+                        if os.path.exists(raw_file):
+                            os.remove(raw_file)
+                else:
+                    self._copy_database(temp_file, progress_callback)
+                os.replace(temp_file, backup_file)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+            # 只清理自動備份目錄，用戶選擇的目錄中同名格式的文件可能是以前手動保存的備份
+            if self.keep and os.path.normcase(os.path.abspath(target_dir)) == \
+                    os.path.normcase(os.path.abspath(self.backup_dir)):
+                self.prune(target_dir)
+            return backup_file
+
+    def backup_async(self, target_dir: Optional[str] = None, compress: Optional[bool] = None,
+                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                     done_callback: Optional[Callable[[Optional[str], Optional[Exception]], None]] = None
+                     ) -> threading.Thread:
+        """在後台線程中執行備份
+
+        回調在後台線程中調用，更新界面時需自行切換到主線程。
+
+        Args:
+            target_dir (str, optional): 備份目錄
+            compress (bool, optional): 是否壓縮
+            progress_callback (Callable, optional): 進度回調，參數為 (已複製頁數, 總頁數)
+            done_callback (Callable, optional): 完成回調，參數為 (備份文件路徑, 錯誤)，成功時錯誤為 None
+
+        Returns:
+            threading.Thread: 執行備份的線程
+        """
+        def run():
+            try:
+                backup_file = self.backup(target_dir, compress, progress_callback)
+            except (sqlite3.Error, OSError) as e:
+                print(f"備份失敗: {e}")
+                if done_callback:
+                    done_callback(None, e)
+                return
+            print(f"備份完成: {backup_file}")
+            if done_callback:
+                done_callback(backup_file, None)
+
+        thread = threading.Thread(target=run, name="db-backup", daemon=True)
+        thread.start()
+        return thread
+
+    def list_backups(self, target_dir: Optional[str] = None) -> List[str]:
+        """列出目錄中的備份文件，按時間從舊到新排序
+
+        Args:
+            target_dir (str, optional): 備份目錄
+
+        Returns:
+            List[str]: 備份文件路徑列表
+        """
+        target_dir = target_dir or self.backup_dir
+        if not os.path.isdir(target_dir):
+            return []
+        names = sorted(name for name in os.listdir(target_dir) if _BACKUP_FILE_PATTERN.match(name))
+        return [os.path.join(target_dir, name) for name in names]
+
+    def prune(self, target_dir: Optional[str] = None) -> List[str]:
+        """刪除超出保留數量的舊備份
+
+        Args:
+            target_dir (str, optional): 備份目錄
+
+        Returns:
+            List[str]: 被刪除的備份文件
+        """
+        backups = self.list_backups(target_dir)
+        removed = backups[:-self.keep] if self.keep and len(backups) > self.keep else []
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"刪除舊備份失敗: {e}")
+        return removed
+
+    def _new_backup_path(self, target_dir: str, compress: bool) -> str:
+        """生成不與現有文件衝突的備份文件名"""
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        extension = ".db.gz" if compress else ".db"
+        backup_file = os.path.join(target_dir, f"{BACKUP_PREFIX}{timestamp}{extension}")
+        counter = 1
+        while os.path.exists(backup_file):
+            backup_file = os.path.join(target_dir, f"{BACKUP_PREFIX}{timestamp}_{counter}{extension}")
+            counter += 1
+        return backup_file
+
+    def _copy_database(self, target_file: str,
+                       progress_callback: Optional[Callable[[int, int], None]] = None):
+        """用在線備份接口分步複製數據庫
+
+        持續有寫入時分步備份可能一直重新開始，重啟次數超過 max_restarts 後改為一步複製剩餘全部頁面。
+        """
+        state = {"copied": 0, "restarts": 0}
+
+        def progress(status, remaining, total):
+            copied = total - remaining
+            if copied < state["copied"]:
+                state["restarts"] += 1
+                if state["restarts"] > self.max_restarts:
+                    raise _BackupRestarted()
+            state["copied"] = copied
+            if progress_callback:
+                progress_callback(copied, total)
+
+        source = sqlite3.connect(self.db_file, timeout=30.0)
+        target = sqlite3.connect(target_file)
+        try:
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=progress, sleep=0.005)
+            except _BackupRestarted:
+                print(f"數據庫持續寫入，備份已重新開始 {state['restarts']} 次，改為一次性複製")
+                source.backup(target, pages=-1)
+                if progress_callback:
+                    progress_callback(1, 1)
+        finally:
+            target.close()
+            source.close()
+
+
+class _BackupRestarted(Exception):
+    """分步備份因源數據庫被修改而重啟過多次"""
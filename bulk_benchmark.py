@@ -0,0 +1,74 @@
+"""模板批量寫入吞吐量測試
+
+在臨時數據庫上比較逐個調用 add_template 與 add_templates_bulk 的寫入速度，
+分別測試插入新模板和更新已有模板，結果以每秒模板數表示。
+
+用法:
+    python bulk_benchmark.py [模板數量]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from typing import Dict, List
+
+from db_manager import DatabaseManager
+from query_plan_checker import build_template_records
+
+BATCH_SIZES = [100, 500, 2000]
+
+
+def run_single(db_manager: DatabaseManager, templates: List[Dict]) -> float:
+    """逐個調用 add_template，返回耗時（秒）"""
+    event_type_ids = {}
+    start = time.perf_counter()
+    for template in templates:
+        event_type = template["event_type"]
+        if event_type not in event_type_ids:
+            event_type_ids[event_type] = db_manager.add_event_type(event_type)
+        db_manager.add_template(
+            event_type_ids[event_type], template["name"], template["to"], template["cc"],
+            template["subject"], template["body"], template["variables"], template["note_en"],
+            template["tag_en"], template["sender"]
+        )
+    return time.perf_counter() - start
+
+
+def run_bulk(db_manager: DatabaseManager, templates: List[Dict], batch_size: int) -> float:
+    """調用 add_templates_bulk，返回耗時（秒）"""
+    start = time.perf_counter()
+    db_manager.add_templates_bulk(templates, batch_size=batch_size)
+    return time.perf_counter() - start
+
+
+def run_benchmark(template_count: int = 20000):
+    """對每種寫入方式分別測試插入和更新
+
+    Args:
+        template_count (int): 每輪寫入的模板數量
+    """
+    inserts = build_template_records(template_count)
+    updates = build_template_records(template_count, revision=1)
+    cases = [("add_template", lambda db, templates: run_single(db, templates))]
+    for batch_size in BATCH_SIZES:
+        cases.append((f"add_templates_bulk({batch_size})",
+                      lambda db, templates, size=batch_size: run_bulk(db, templates, size)))
+
+    print(f"每輪寫入 {len(inserts)} 個模板\n")
+    print(f"{'method':<26} {'insert/s':>10} {'update/s':>10}")
+    for label, action in cases:
+        temp_dir = tempfile.mkdtemp(prefix="bulk_benchmark_")
+        db_manager = DatabaseManager(os.path.join(temp_dir, "app.db"))
+        try:
+            insert_time = action(db_manager, inserts)
+            update_time = action(db_manager, updates)
+            print(f"{label:<26} {len(inserts) / insert_time:>10.0f} {len(updates) / update_time:>10.0f}")
+        finally:
+            db_manager.close_connection()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    run_benchmark(count)
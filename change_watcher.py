@@ -0,0 +1,106 @@
+import os
+import sqlite3
+from typing import Callable, Dict, Optional, Set, Tuple
+
+
+class ChangeWatcher:
+    """定時檢測其他進程對數據庫的修改
+
+    輪詢 PRAGMA data_version：其他連接提交寫入後該值才會變化，本連接自己的寫入不會改變它，
+    讀取時不訪問任何表，代價很低。無法讀取時改為比較數據庫文件和 WAL 文件的修改時間。
+    檢測到變化後按事件類型比較模板修改計數，只報告受影響的事件類型。
+    """
+
+    def __init__(self, db_manager, interval_ms: int = 2000):
+        """初始化監視器
+
+        Args:
+            db_manager (DatabaseManager): 數據庫管理器，使用調用線程的連接輪詢
+            interval_ms (int): 輪詢間隔（毫秒）
+        """
+        self.db_manager = db_manager
+        self.interval_ms = interval_ms
+        self._root = None
+        self._callback = None
+        self._after_id = None
+        self._version = self._read_version()
+        self._signatures = self._read_signatures()
+        self.polls = 0
+        self.changes = 0
+
+    def start(self, root, callback: Callable[[Set[str], bool], None]):
+        """用 Tk 的 after 定時輪詢，回調在主線程中執行
+
+        Args:
+            root: Tk 根窗口
+            callback (Callable): 變化回調，參數為 (有模板變化的事件類型名稱集合, 事件類型列表是否變化)
+        """
+        self._root = root
+        self._callback = callback
+        self._schedule()
+
+    def stop(self):
+        """停止輪詢"""
+        if self._root is not None and self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+        self._after_id = None
+        self._root = None
+
+    def _schedule(self):
+        self._after_id = self._root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        try:
+            changes = self.poll()
+        except sqlite3.Error as e:
+            # 其他進程正在寫入時可能暫時鎖定，下次再試
+            print(f"檢測數據庫變化失敗: {e}")
+            changes = None
+        if changes and self._callback:
+            self._callback(*changes)
+        if self._root is not None:
+            self._schedule()
+
+    def poll(self) -> Optional[Tuple[Set[str], bool]]:
+        """檢查一次數據庫是否被其他進程修改
+
+        Returns:
+            Optional[Tuple[Set[str], bool]]: 沒有變化時返回 None，否則返回
+                (有模板變化的事件類型名稱集合, 事件類型列表是否變化)
+        """
+        self.polls += 1
+        version = self._read_version()
+        if version == self._version:
+            return None
+        self._version = version
+
+        # 設置等緩存數據也可能被其他進程修改
+        self.db_manager.refresh_caches()
+
+        signatures = self._read_signatures()
+        old_signatures = self._signatures
+        self._signatures = signatures
+        old_names = {name for name, _ in old_signatures.values()}
+        new_names = {name for name, _ in signatures.values()}
+        changed = {signature[0] for event_type_id, signature in signatures.items()
+                   if old_signatures.get(event_type_id) != signature}
+        event_types_changed = old_names != new_names
+        if not changed and not event_types_changed:
+            return None
+        self.changes += 1
+        return changed, event_types_changed
+
+    def _read_version(self):
+        """讀取 data_version，失敗時返回數據庫文件和 WAL 文件的修改時間"""
+        try:
+            return self.db_manager.get_connection().execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            db_file = self.db_manager.db_file
+            return tuple(os.path.getmtime(path) if os.path.exists(path) else None
+                         for path in (db_file, db_file + "-wal"))
+
+    def _read_signatures(self) -> Dict[int, Tuple[str, int]]:
+        """每個事件類型的 (名稱, 模板修改計數)，計數由觸發器維護，不依賴寫入端的時鐘"""
+        cursor = self.db_manager.get_connection().cursor()
+        cursor.execute("SELECT id, name, change_count FROM event_types")
+        return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
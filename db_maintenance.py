@@ -0,0 +1,129 @@
+import time
+import sqlite3
+from typing import Dict, Optional
+
+
+class DatabaseMaintenance:
+    """在程序空閒時分步維護數據庫
+
+    每次只執行一個小步驟，依次為：
+    用 PRAGMA incremental_vacuum 回收少量空閒頁（需遷移 7 開啟的 auto_vacuum=INCREMENTAL）；
+    距上次 ANALYZE 超過 analyze_interval 時重新收集統計（用 analysis_limit 限制每個索引的掃描行數）；
+    距上次 PRAGMA optimize 超過 optimize_interval 時執行 optimize。
+    """
+
+    def __init__(self, db_manager, vacuum_pages: int = 256, idle_seconds: float = 30.0,
+                 check_interval_ms: int = 5000, analyze_interval: float = 24 * 3600,
+                 optimize_interval: float = 3600, analysis_limit: int = 1000):
+        """初始化維護任務
+
+        Args:
+            db_manager (DatabaseManager): 數據庫管理器，使用調用線程的連接
+            vacuum_pages (int): 每步最多回收的頁數
+            idle_seconds (float): 無用戶操作多久後視為空閒
+            check_interval_ms (int): 檢查是否空閒的間隔（毫秒）
+            analyze_interval (float): 兩次 ANALYZE 之間的最短秒數，上次時間保存在設置項 last_analyze
+            optimize_interval (float): 兩次 PRAGMA optimize 之間的最短秒數
+            analysis_limit (int): ANALYZE 時每個索引最多掃描的行數
+        """
+        self.db_manager = db_manager
+        self.vacuum_pages = vacuum_pages
+        self.idle_seconds = idle_seconds
+        self.check_interval_ms = check_interval_ms
+        self.analyze_interval = analyze_interval
+        self.optimize_interval = optimize_interval
+        self.analysis_limit = analysis_limit
+        self.last_activity = time.monotonic()
+        self.last_optimize = time.monotonic()
+        self.bytes_reclaimed = 0
+        self._root = None
+        self._after_id = None
+
+    def start(self, root):
+        """綁定用戶輸入事件以判斷是否空閒，並用 Tk 的 after 定時檢查
+
+        Args:
+            root: Tk 根窗口
+        """
+        self._root = root
+        for sequence in ("<Any-KeyPress>", "<Any-ButtonPress>", "<MouseWheel>"):
+            root.bind_all(sequence, self.record_activity, add="+")
+        self._schedule()
+
+    def stop(self):
+        """停止定時維護"""
+        if self._root is not None and self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+        self._after_id = None
+        self._root = None
+
+    def record_activity(self, event=None):
+        """記錄用戶操作時間"""
+        self.last_activity = time.monotonic()
+
+    def is_idle(self) -> bool:
+        return time.monotonic() - self.last_activity >= self.idle_seconds
+
+    def _schedule(self):
+        self._after_id = self._root.after(self.check_interval_ms, self._tick)
+
+    def _tick(self):
+        if self.is_idle():
+            self.run_step()
+        if self._root is not None:
+            self._schedule()
+
+    def run_step(self) -> Optional[Dict]:
+        """執行一個維護步驟
+
+        Returns:
+            Optional[Dict]: 執行的步驟 {"step", "bytes", "ms"}，沒有需要執行的步驟時返回 None
+        """
+        conn = self.db_manager.get_connection()
+        try:
+            if self._freelist_count(conn) and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return self._incremental_vacuum(conn)
+            last_analyze = float(self.db_manager.get_setting('last_analyze', '0'))
+            if time.time() - last_analyze >= self.analyze_interval:
+                return self._analyze(conn)
+            if time.monotonic() - self.last_optimize >= self.optimize_interval:
+                return self._optimize(conn)
+        except sqlite3.Error as e:
+            # 其他連接持有寫鎖時跳過，下次空閒再試
+            print(f"數據庫維護失敗: {e}")
+        return None
+
+    @staticmethod
+    def _freelist_count(conn: sqlite3.Connection) -> int:
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection) -> Dict:
+        start = time.perf_counter()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+        # 每執行一步只釋放一頁，execute 只執行一步，executescript 會執行到結束
+        conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+        reclaimed = (pages_before - conn.execute("PRAGMA page_count").fetchone()[0]) * page_size
+        elapsed = (time.perf_counter() - start) * 1000
+        self.bytes_reclaimed += reclaimed
+        print(f"incremental_vacuum 回收 {reclaimed} 字節，剩餘空閒頁 {self._freelist_count(conn)}，"
+              f"耗時 {elapsed:.1f} ms")
+        return {"step": "incremental_vacuum", "bytes": reclaimed, "ms": elapsed}
+
+    def _analyze(self, conn: sqlite3.Connection) -> Dict:
+        start = time.perf_counter()
+        conn.execute(f"PRAGMA analysis_limit = {int(self.analysis_limit)}")
+        conn.execute("ANALYZE")
+        conn.commit()
+        elapsed = (time.perf_counter() - start) * 1000
+        self.db_manager.save_setting('last_analyze', str(int(time.time())))
+        print(f"ANALYZE 完成，耗時 {elapsed:.1f} ms")
+        return {"step": "analyze", "bytes": 0, "ms": elapsed}
+
+    def _optimize(self, conn: sqlite3.Connection) -> Dict:
+        start = time.perf_counter()
+        conn.execute("PRAGMA optimize")
+        elapsed = (time.perf_counter() - start) * 1000
+        self.last_optimize = time.monotonic()
+        print(f"PRAGMA optimize 完成，耗時 {elapsed:.1f} ms")
+        return {"step": "optimize", "bytes": 0, "ms": elapsed}
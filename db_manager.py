@@ -1,42 +1,599 @@
 import sqlite3
+import hashlib
 import os
+import re
 import json
-from typing import Dict, List, Any, Optional
+import time
+import html
+import atexit
+import zlib
+import difflib
+import threading
+from typing import Dict, List, Any, Optional, Iterable, Callable, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd 為可選依賴，未安裝時使用 zlib
+    zstandard = None
+
+
+# SQLite性能配置，通過設置項 db_profile 選擇
+# compatible 保持回滾日誌，適用於放在網絡共享上的數據庫（WAL 不支持網絡文件系統）
+PRAGMA_PROFILES = {
+    "compatible": {
+        "busy_timeout": 5000,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -8000,
+        "temp_store": "DEFAULT",
+    },
+    "performance": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_PRAGMA_PROFILE = "compatible"
+
+# 保存在數據庫文件中的設置，只在切換配置時修改一次，打開連接時不重複設置
+PERSISTENT_PRAGMAS = {"journal_mode"}
+
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, Any], include_persistent: bool = False):
+    """在連接上應用一組 PRAGMA 設置
+    
+    Args:
+        conn (sqlite3.Connection): 數據庫連接
+        pragmas (Dict[str, Any]): PRAGMA 名稱到值的映射
+        include_persistent (bool): 是否同時設置 journal_mode 等保存在文件中的設置
+    """
+    for name, value in pragmas.items():
+        if name in PERSISTENT_PRAGMAS and not include_persistent:
+            continue
+        try:
+            conn.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.Error as e:
+            print(f"設置 PRAGMA {name} 失敗: {e}")
+
+
+def prepare_connection(conn: sqlite3.Connection):
+    """應用每個連接都需要的設置：按列名訪問、外鍵約束和正文解壓函數"""
+    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key support
+    conn.create_function("template_body", 2, _decode_body, deterministic=True)
+
+
+class ConnectionPool:
+    """线程本地的SQLite连接池，每个线程复用一个长连接，总连接数有上限"""
+
+    def __init__(self, db_file: str, max_connections: int = 8, timeout: float = 30.0):
+        """初始化连接池
+        
+        Args:
+            db_file (str): 数据库文件路径
+            max_connections (int): 同时存在的连接数上限
+            timeout (float): 连接数达到上限时等待空闲连接的秒数
+        """
+        self.db_file = db_file
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = {}  # 线程ident -> (线程对象, 连接)
+        self._condition = threading.Condition()
+        self._generation = 0  # close_all 之后递增，使各线程缓存的旧连接失效
+        self.pragmas = dict(PRAGMA_PROFILES[DEFAULT_PRAGMA_PROFILE])
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def _open(self) -> sqlite3.Connection:
+        """打开新连接并应用连接级设置（只在创建时执行一次）"""
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)  # Enable multi-threading support for SQLite
+        prepare_connection(conn)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def configure(self, pragmas: Dict[str, Any]):
+        """更換 PRAGMA 配置，新連接和池中現有連接都會應用
+        
+        Args:
+            pragmas (Dict[str, Any]): PRAGMA 名稱到值的映射
+        """
+        with self._condition:
+            self.pragmas = dict(pragmas)
+            for thread, conn in self._connections.values():
+                apply_pragmas(conn, self.pragmas)
+
+    def _prune_dead_threads(self):
+        """关闭已结束线程遗留的连接（调用方需持有锁）"""
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                del self._connections[ident]
+                conn.close()
+                self.closed += 1
+
+    def acquire(self) -> sqlite3.Connection:
+        """获取当前线程的连接，不存在时新建
+        
+        Returns:
+            sqlite3.Connection: 当前线程专用的数据库连接
+        
+        Raises:
+            sqlite3.OperationalError: 等待超时仍无可用连接
+        """
+        cached = getattr(self._local, 'conn', None)
+        with self._condition:
+            if cached is not None and cached[0] == self._generation:
+                self.reused += 1
+                return cached[1]
+            
+            deadline = time.monotonic() + self.timeout
+            self._prune_dead_threads()
+            while len(self._connections) >= self.max_connections:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"Connection pool exhausted ({self.max_connections} connections in use)")
+                self._condition.wait(remaining)
+                self._prune_dead_threads()
+            
+            conn = self._open()
+            self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+            self.opened += 1
+            self._local.conn = (self._generation, conn)
+            return conn
+
+    def release(self):
+        """关闭并归还当前线程的连接，供即将结束的工作线程调用"""
+        self._local.conn = None
+        with self._condition:
+            entry = self._connections.pop(threading.get_ident(), None)
+            if entry:
+                entry[1].close()
+                self.closed += 1
+            self._condition.notify_all()
+
+    def close_all(self):
+        """关闭池中所有连接"""
+        with self._condition:
+            for thread, conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    print(f"关闭数据库连接失败: {e}")
+                self.closed += 1
+            self._connections.clear()
+            self._generation += 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        """获取连接池统计
+        
+        Returns:
+            Dict[str, int]: opened/reused/closed 计数以及当前活动连接数
+        """
+        with self._condition:
+            return {
+                "opened": self.opened,
+                "reused": self.reused,
+                "closed": self.closed,
+                "active": len(self._connections),
+            }
+
+
+# 模板正文按 SHA-256 存放在 template_bodies 中，壓縮後共享；只有查詢投影正文時才解壓
+_BODY_SQL = """COALESCE((SELECT template_body(b.codec, b.data)
+                           FROM template_bodies b
+                           WHERE b.hash = t.body_hash), '')"""
+_BODY_COLUMN = f"{_BODY_SQL} AS body"
+
+
+# 保存路徑上的壓縮級別：更高的級別對 HTML 正文只多省幾個百分點，耗時卻成倍增加
+BODY_ZSTD_LEVEL = 3
+BODY_ZLIB_LEVEL = 6
+
+
+def _encode_body(body: str):
+    """壓縮正文，返回 (編碼方式, 數據)；壓縮無收益時原樣保存"""
+    raw = body.encode('utf-8')
+    if zstandard is not None:
+        codec, data = "zstd", zstandard.ZstdCompressor(level=BODY_ZSTD_LEVEL).compress(raw)
+    else:
+        codec, data = "zlib", zlib.compress(raw, BODY_ZLIB_LEVEL)
+    if len(data) >= len(raw):
+        return "raw", raw
+    return codec, data
+
+
+def _decode_body(codec: Optional[str], data: Optional[bytes]) -> Optional[str]:
+    """解壓正文，註冊為SQL函數 template_body"""
+    if data is None:
+        return None
+    if codec == "zlib":
+        data = zlib.decompress(data)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Template body is zstd-compressed but the zstandard module is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return bytes(data).decode('utf-8')
+
+
+# 以相关子查询把模板变量聚合为JSON数组，随模板行一次取回，避免逐行查询 template_variables
+# 变量按保存时记录的 position 排序（先主题后正文的首次出现顺序），界面无需再扫描正文
+_VARIABLES_COLUMN = """(SELECT json_group_array(variable_name)
+                           FROM (SELECT tv.variable_name FROM template_variables tv
+                                 WHERE tv.template_id = t.id ORDER BY tv.position)) AS variables_json"""
+
+
+# 模板中的 {變量} 佔位符
+_VARIABLE_PATTERN = re.compile(r'\{([^{}]+)\}')
+
+
+def _variable_positions(subject: Optional[str], body: Optional[str],
+                        variables: Iterable[str]) -> List[Tuple[str, int, Optional[str]]]:
+    """按變量首次出現的順序編號：先主題後正文，都沒有出現的變量按原順序排在最後
+    
+    Args:
+        subject (str): 模板主題
+        body (str): 模板正文
+        variables (Iterable[str]): 模板的變量名，重複的只保留一個
+    
+    Returns:
+        List[Tuple[str, int, Optional[str]]]: (變量名, 序號, 位置) 列表，按序號排列；
+            位置為 subject 或 body，都沒有出現時為 None
+    """
+    remaining = dict.fromkeys(variables or [])
+    positions = []
+    for text, location in ((subject, "subject"), (body, "body")):
+        if not remaining or not text:
+            continue
+        for match in _VARIABLE_PATTERN.finditer(text):
+            name = match.group(1)
+            if name in remaining:
+                del remaining[name]
+                positions.append((name, len(positions), location))
+                # 所有變量都已找到時不必掃描正文的其餘部分
+                if not remaining:
+                    break
+    positions.extend((name, len(positions) + index, None) for index, name in enumerate(remaining))
+    return positions
+
+
+# 模板更新時間，精確到毫秒
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _content_hash(recipient: Optional[str], cc: Optional[str], subject: Optional[str], body: Optional[str],
+                  note_en: Optional[str], tag_en: Optional[str], sender: Optional[str],
+                  variables: List[str]) -> str:
+    """計算模板內容的哈希，合併導入時用於跳過未改動的模板（變量按集合處理，與存儲方式一致）"""
+    payload = json.dumps([recipient or "", cc or "", subject or "", body or "", note_en or "",
+                          tag_en or "", sender or "", sorted(set(variables or []))], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+# 搜索接口可投影的欄位：返回鍵 -> SQL 表達式（snippet 在全文檢索時才有值）
+_SEARCH_COLUMNS = {
+    "id": "t.id",
+    "name": "t.name",
+    "event_type": "et.name",
+    "to": "t.recipient",
+    "cc": "t.cc",
+    "subject": "t.subject",
+    "body": _BODY_SQL,
+    "note_en": "t.note_en",
+    "tag_en": "t.tag_en",
+    "sender": "t.sender",
+    "updated_at": "t.updated_at",
+    "variables": _VARIABLES_COLUMN.replace(" AS variables_json", ""),
+    "snippet": "snippet(templates_fts, -1, '[', ']', '…', 12)",
+}
+
+
+# 全文索引只收录去除標記後的正文，避免匹配到 base64 圖片數據和 HTML 屬性
+_MARKUP_BLOCK_PATTERN = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_MARKUP_TAG_PATTERN = re.compile(r'<[^>]*>')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+# unicode61 分詞器會把連續的中日韓文字視為一個詞，索引前將其逐字分開，使詞內搜索可用
+_CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_CJK_PATTERN = re.compile(f'([{_CJK_CHARS}])')
+_CJK_GAP_PATTERN = re.compile(f'([{_CJK_CHARS}]\\]?) +(?=\\[?[{_CJK_CHARS}])')
+
+
+def _strip_markup(content: Optional[str]) -> str:
+    """移除HTML標記、圖片數據和實體，返回純文本"""
+    if not content:
+        return ""
+    text = _MARKUP_BLOCK_PATTERN.sub(' ', content)
+    text = _MARKUP_TAG_PATTERN.sub(' ', text)
+    text = html.unescape(text)
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def _segment_cjk(text: Optional[str]) -> str:
+    """在中日韓文字之間插入空格，供全文索引逐字分詞"""
+    return _CJK_PATTERN.sub(r' \1 ', text or "")
+
+
+def _build_match_query(keyword: str) -> str:
+    """將用戶輸入轉換為 FTS5 查詢：每個詞作為短語並支持前綴匹配，詞之間為 AND
+    
+    Args:
+        keyword (str): 搜索關鍵字
+    
+    Returns:
+        str: FTS5 MATCH 表達式，沒有有效詞時返回空字符串
+    """
+    terms = []
+    for term in keyword.split():
+        term = _WHITESPACE_PATTERN.sub(' ', _segment_cjk(term)).strip().replace('"', '""')
+        if term:
+            terms.append(f'"{term}"*')
+    return " ".join(terms)
+
+
+def _search_index_row(template_id: int, name: Optional[str], subject: Optional[str], note: Optional[str],
+                      tag: Optional[str], body: Optional[str]) -> tuple:
+    """生成一行全文索引數據：中日韓文字逐字分開，正文去除標記"""
+    return (template_id, _segment_cjk(name), _segment_cjk(subject), _segment_cjk(note),
+            _segment_cjk(tag), _segment_cjk(_strip_markup(body)))
+
+
+# 批量查詢時每條語句的最大鍵數，低於舊版SQLite的999個參數限制
+_LOOKUP_BATCH = 400
+
+
+def _batched(items: Iterable, size: int):
+    """把可迭代對象按固定大小切分為列表"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# 修訂歷史每隔多少個修訂保存一次完整快照，恢復任一修訂最多應用 KEYFRAME_INTERVAL - 1 個差異
+KEYFRAME_INTERVAL = 10
+# 正文超過以下片段數或字符數時修訂只存完整快照：difflib 的耗時隨片段數增長，大正文會拖慢保存，
+# 也使恢復時應用的每個差異都不超過這個大小
+REVISION_DIFF_MAX_TOKENS = 5000
+REVISION_DIFF_MAX_CHARS = 256 * 1024
+# 修訂中保存的模板欄位（名稱和事件類型由改名/移動單獨管理）
+_REVISION_FIELDS = ("to", "cc", "subject", "body", "note_en", "tag_en", "sender", "variables")
+# 正文按標籤結尾和換行切分後再比較，HTML 一般在這些位置被編輯
+_BODY_TOKEN_PATTERN = re.compile(r'[^>\n]*(?:[>\n]|$)')
+
+
+def _tokenize_body(body: str) -> List[str]:
+    """把正文切分為以 '>' 或換行結尾的片段，拼接後與原文相同"""
+    return [token for token in _BODY_TOKEN_PATTERN.findall(body or "") if token]
+
+
+def _diff_body(old_tokens: List[str], new_tokens: List[str]) -> List[list]:
+    """計算正文片段的差異：[0, 起, 止] 表示複製舊正文的片段區間，[1, 文本] 表示插入新文本"""
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([0, i1, i2])
+        elif j2 > j1:
+            ops.append([1, "".join(new_tokens[j1:j2])])
+    return ops
+
+
+def _apply_body_diff(old_tokens: List[str], ops: List[list]) -> List[str]:
+    """把 _diff_body 的結果應用到舊正文的片段上，返回新正文的片段（連續應用多個差異時無需重新切分）"""
+    tokens = []
+    for op in ops:
+        if op[0] == 0:
+            tokens.extend(old_tokens[op[1]:op[2]])
+        else:
+            tokens.extend(_tokenize_body(op[1]))
+    return tokens
+
+
+def _revision_snapshot(snapshot: Dict) -> Dict:
+    """只保留 _REVISION_FIELDS，空值統一為空字符串或空列表"""
+    return {field: snapshot.get(field) or ([] if field == "variables" else "") for field in _REVISION_FIELDS}
+
+
+def _snapshot_hash(snapshot: Dict) -> str:
+    """修訂內容的哈希，保存時據此判斷模板當前內容是否就是上一修訂，無需重建上一修訂"""
+    # 正文直接按字節計算，不經 JSON 編碼整個大正文
+    fields = json.dumps([snapshot[field] for field in _REVISION_FIELDS if field != "body"], ensure_ascii=False)
+    digest = hashlib.sha1(fields.encode('utf-8'))
+    digest.update(snapshot["body"].encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _revision_delta(previous: Dict, snapshot: Dict) -> Optional[Dict]:
+    """計算相對上一修訂的差異
+
+    Returns:
+        Optional[Dict]: 差異數據；正文超過 REVISION_DIFF_MAX_TOKENS / REVISION_DIFF_MAX_CHARS，
+            或插入的文本超過新正文的一半（差異不比完整快照小多少）時返回 None
+    """
+    if max(len(previous["body"]), len(snapshot["body"])) > REVISION_DIFF_MAX_CHARS:
+        return None
+    old_tokens = _tokenize_body(previous["body"])
+    new_tokens = _tokenize_body(snapshot["body"])
+    if max(len(old_tokens), len(new_tokens)) > REVISION_DIFF_MAX_TOKENS:
+        return None
+    ops = _diff_body(old_tokens, new_tokens)
+    if sum(len(op[1]) for op in ops if op[0] == 1) * 2 > len(snapshot["body"]):
+        return None
+    # 正文之外的欄位很小，直接保存改動過的欄位
+    return {
+        "fields": {field: value for field, value in snapshot.items()
+                   if field != "body" and value != previous[field]},
+        "body": ops,
+    }
+
+
+def _join_cjk(text: Optional[str]) -> str:
+    """移除 _segment_cjk 在中日韓文字之間插入的空格（可含摘要高亮標記）"""
+    return _WHITESPACE_PATTERN.sub(' ', _CJK_GAP_PATTERN.sub(r'\1', (text or "").strip()))
+
 
 class DatabaseManager:
     """数据库管理类，提供SQLite数据库操作功能"""
     
-    def __init__(self, db_file: str = 'data/app.db'):
+    def __init__(self, db_file: str = 'data/app.db', max_connections: int = 8,
+                 pragma_profile: Optional[str] = None):
         """初始化数据库管理器
         
         Args:
             db_file (str): 数据库文件路径
+            max_connections (int): 连接池中同时存在的连接数上限
+            pragma_profile (str, optional): PRAGMA_PROFILES 中的配置名，为None时读取设置项 db_profile
         """
         # 确保数据目录存在
-        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
         
         self.db_file = db_file
-        self.conn = None
+        # 全文索引是否可用，首次搜索或寫入索引時從設置項 search_index 讀取
+        self._fts_enabled = None
+        # 設置和應用信息的進程內緩存，首次讀取時加載，經 save_setting/add_app_info_translation 寫穿
+        self._metadata = None
+        self._metadata_lock = threading.Lock()
+        self.pool = ConnectionPool(db_file, max_connections=max_connections)
+        # 进程退出时保证关闭所有连接
+        atexit.register(self.close_connection)
         self.init_database()
+        
+        self.pragma_profile = DEFAULT_PRAGMA_PROFILE
+        profile = pragma_profile or self.get_setting('db_profile', DEFAULT_PRAGMA_PROFILE)
+        if profile not in PRAGMA_PROFILES:
+            print(f"未知的數據庫配置 {profile}，使用 {DEFAULT_PRAGMA_PROFILE}")
+            profile = DEFAULT_PRAGMA_PROFILE
+        if profile != self.pragma_profile:
+            self.set_pragma_profile(profile, persist=False)
     
     def get_connection(self):
-        """获取数据库连接，每个线程使用自己的连接"""
-        conn = sqlite3.connect(self.db_file, check_same_thread=False)  # Enable multi-threading support for SQLite
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key support
-        return conn
+        """获取数据库连接，每个线程复用自己的长连接"""
+        return self.pool.acquire()
+    
+    def release_connection(self):
+        """归还当前线程的连接，工作线程结束前调用"""
+        self.pool.release()
     
     def close_connection(self):
-        """关闭数据库连接"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        """关闭所有数据库连接，关闭前执行 PRAGMA optimize 更新查询规划统计"""
+        if self.pool.stats()["active"]:
+            try:
+                start = time.perf_counter()
+                self.pool.acquire().execute("PRAGMA optimize")
+                print(f"PRAGMA optimize 完成，耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+            except sqlite3.Error as e:
+                print(f"PRAGMA optimize 失敗: {e}")
+        self.pool.close_all()
+    
+    def set_pragma_profile(self, profile: str, persist: bool = True):
+        """切換SQLite性能配置
+        
+        Args:
+            profile (str): PRAGMA_PROFILES 中的配置名
+            persist (bool): 是否保存到設置項 db_profile，下次啟動時沿用
+        
+        Raises:
+            ValueError: 配置名不存在
+        """
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Unknown pragma profile: {profile}")
+        pragmas = PRAGMA_PROFILES[profile]
+        self.pool.configure(pragmas)
+        self.pragma_profile = profile
+        if persist:
+            # 日誌模式保存在數據庫文件中，只在用戶切換配置時修改
+            conn = self.get_connection()
+            persistent = {name: value for name, value in pragmas.items() if name in PERSISTENT_PRAGMAS}
+            apply_pragmas(conn, persistent, include_persistent=True)
+            self.save_setting('db_profile', profile)
+    
+    def get_connection_stats(self) -> Dict[str, int]:
+        """获取连接池统计，用于确认连接被复用
+        
+        Returns:
+            Dict[str, int]: opened/reused/closed/active 计数
+        """
+        return self.pool.stats()
+    
+    # 數據庫結構遷移：(版本, 說明, 方法名, 是否在事務中執行)，按版本順序執行。
+    # 已發佈的遷移不可修改，結構變更只能追加新版本。遷移需可重複執行，
+    # 以兼容引入版本號之前由舊程序創建、user_version 仍為 0 的數據庫。
+    MIGRATIONS = [
+        (1, "base tables", "_migrate_base_tables", True),
+        (2, "template change tracking columns", "_migrate_template_tracking", True),
+        (3, "compressed template bodies", "_migrate_template_bodies", True),
+        (4, "full-text search index", "_migrate_search_index", True),
+        (5, "reclaim space", "_migrate_vacuum", False),
+        (6, "template revision history", "_migrate_template_revisions", True),
+        (7, "incremental auto-vacuum", "_migrate_incremental_vacuum", False),
+        (8, "ordered template variables", "_migrate_variable_positions", True),
+        (9, "event type change counters", "_migrate_change_counters", True),
+        (10, "revision content hashes", "_migrate_revision_hashes", True),
+        (11, "shared revision bodies", "_migrate_revision_bodies", True),
+    ]
     
     def init_database(self):
-        """初始化数据库表结构"""
+        """按 PRAGMA user_version 執行未應用的結構遷移，已是最新版本時只讀取一次版本號"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        latest = self.MIGRATIONS[-1][0]
+        if version > latest:
+            print(f"數據庫版本 {version} 高於程序支持的版本 {latest}，請更新程序")
+        
+        for migration_version, description, method_name, transactional in self.MIGRATIONS:
+            if migration_version <= version:
+                continue
+            start = time.perf_counter()
+            if transactional:
+                try:
+                    # 立即取得寫鎖，並確認其他進程沒有搶先完成同一遷移
+                    conn.execute("BEGIN IMMEDIATE")
+                    if cursor.execute("PRAGMA user_version").fetchone()[0] >= migration_version:
+                        conn.rollback()
+                        continue
+                    getattr(self, method_name)(cursor)
+                    cursor.execute(f"PRAGMA user_version = {migration_version}")
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    print(f"數據庫遷移 {migration_version} ({description}) 失敗: {e}")
+                    raise
+            else:
+                # VACUUM 等語句不能在事務中執行，無法用寫鎖保護；執行前再讀一次版本號，
+                # 其他進程已完成同一遷移時跳過
+                if cursor.execute("PRAGMA user_version").fetchone()[0] >= migration_version:
+                    continue
+                getattr(self, method_name)(cursor)
+                cursor.execute(f"PRAGMA user_version = {migration_version}")
+            print(f"數據庫遷移 {migration_version} ({description}) 完成，"
+                  f"耗時 {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    @property
+    def fts_enabled(self) -> bool:
+        """全文索引是否可用（遷移 4 記錄在設置項 search_index 中），首次使用時讀取"""
+        if self._fts_enabled is None:
+            self._fts_enabled = self.get_setting('search_index') == 'fts5'
+        return self._fts_enabled
+    
+    @staticmethod
+    def _table_columns(cursor, table: str) -> List[str]:
+        """返回表的欄位名，表不存在時返回空列表"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [column['name'] for column in cursor.fetchall()]
+    
+    def _migrate_base_tables(self, cursor):
+        """遷移 1：創建設置、語言、事件類型、模板和變量表"""
         # 創建設置表
         cursor.execute('''CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
@@ -72,28 +629,23 @@ class DatabaseManager:
             PRIMARY KEY (key, language_code),
             FOREIGN KEY (language_code) REFERENCES languages(code)
         )''')
-
-        # 檢查 templates 表是否已存在 sender 欄位
-        cursor.execute("PRAGMA table_info(templates)")
-        table_info = cursor.fetchall()
-        columns = [column['name'] for column in table_info]
-        
-        if not table_info:  # 如果表不存在，創建帶有 sender 欄位的表
-            cursor.execute('''CREATE TABLE IF NOT EXISTS templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event_type_id INTEGER,
-                name TEXT NOT NULL,
-                recipient TEXT,
-                cc TEXT,
-                subject TEXT,
-                body TEXT,
-                note_en TEXT,
-                tag_en TEXT,
-                sender TEXT,
-                FOREIGN KEY (event_type_id) REFERENCES event_types(id) ON DELETE CASCADE,
-                UNIQUE (event_type_id, name)
-            )''')
-        elif 'sender' not in columns:  # 如果表已存在但缺少 sender 欄位，添加它
+        
+        # 創建模板表
+        cursor.execute('''CREATE TABLE IF NOT EXISTS templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type_id INTEGER,
+            name TEXT NOT NULL,
+            recipient TEXT,
+            cc TEXT,
+            subject TEXT,
+            body TEXT,
+            note_en TEXT,
+            tag_en TEXT,
+            sender TEXT,
+            FOREIGN KEY (event_type_id) REFERENCES event_types(id) ON DELETE CASCADE,
+            UNIQUE (event_type_id, name)
+        )''')
+        if 'sender' not in self._table_columns(cursor, 'templates'):  # 舊表缺少 sender 欄位
             cursor.execute('ALTER TABLE templates ADD COLUMN sender TEXT')
         
         # 創建模板變量表
@@ -103,8 +655,259 @@ class DatabaseManager:
             PRIMARY KEY (template_id, variable_name),
             FOREIGN KEY (template_id) REFERENCES templates(id) ON DELETE CASCADE
         )''')
+    
+    def _migrate_template_tracking(self, cursor):
+        """遷移 2：模板更新時間和內容哈希（合併導入用，舊數據為空時視為已改動）"""
+        columns = self._table_columns(cursor, 'templates')
+        if 'updated_at' not in columns:
+            cursor.execute('ALTER TABLE templates ADD COLUMN updated_at TEXT')
+        if 'content_hash' not in columns:
+            cursor.execute('ALTER TABLE templates ADD COLUMN content_hash TEXT')
+    
+    def _migrate_template_bodies(self, cursor):
+        """遷移 3：正文移入按內容哈希去重的壓縮正文表"""
+        cursor.execute('''CREATE TABLE IF NOT EXISTS template_bodies (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL
+        )''')
+        columns = self._table_columns(cursor, 'templates')
+        if 'body_hash' not in columns:
+            cursor.execute('ALTER TABLE templates ADD COLUMN body_hash TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_templates_body_hash ON templates(body_hash)')
+        # 沒有模板再引用的正文隨之刪除
+        cursor.execute('''CREATE TRIGGER IF NOT EXISTS template_bodies_release_delete AFTER DELETE ON templates
+            WHEN old.body_hash IS NOT NULL
+            BEGIN
+                DELETE FROM template_bodies WHERE hash = old.body_hash
+                    AND NOT EXISTS (SELECT 1 FROM templates WHERE body_hash = old.body_hash);
+            END''')
+        cursor.execute('''CREATE TRIGGER IF NOT EXISTS template_bodies_release_update AFTER UPDATE OF body_hash ON templates
+            WHEN old.body_hash IS NOT NULL AND old.body_hash IS NOT new.body_hash
+            BEGIN
+                DELETE FROM template_bodies WHERE hash = old.body_hash
+                    AND NOT EXISTS (SELECT 1 FROM templates WHERE body_hash = old.body_hash);
+            END''')
+        
+        if 'body' in columns:
+            rows = cursor.execute("SELECT id, body FROM templates WHERE body IS NOT NULL").fetchall()
+            hashes = self._store_bodies(cursor, [row['body'] for row in rows])
+            cursor.executemany("UPDATE templates SET body_hash = ? WHERE id = ?",
+                               [(body_hash, row['id']) for body_hash, row in zip(hashes, rows)])
+            try:
+                cursor.execute("ALTER TABLE templates DROP COLUMN body")
+            except sqlite3.OperationalError:
+                # SQLite 3.35 以前不支持刪除欄位，清空舊欄位即可
+                cursor.execute("UPDATE templates SET body = NULL")
+            if rows:
+                print(f"已遷移 {len(rows)} 個模板正文")
+    
+    def _store_body(self, cursor, body: Optional[str]) -> Optional[str]:
+        """保存正文並返回其哈希，相同正文只存一份，空正文不保存
         
-        conn.commit()
+        Args:
+            cursor: 當前事務的游標
+            body (str): 模板正文
+        
+        Returns:
+            Optional[str]: 正文的 SHA-256，空正文返回 None
+        """
+        return self._store_bodies(cursor, [body])[0]
+
+    def _migrate_search_index(self, cursor):
+        """遷移 4：創建全文索引表並從現有模板建立索引
+        
+        FTS5 不可用時記錄在設置項 search_index 中，搜索回退到 LIKE。
+        """
+        try:
+            cursor.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts USING fts5(
+                name, subject, note, tag, body,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )''')
+        except sqlite3.OperationalError as e:
+            print(f"全文索引不可用，搜索將使用 LIKE: {e}")
+            cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('search_index', 'like')")
+            return
+        
+        # 刪除模板（包括事件類型級聯刪除）時同步移除索引
+        cursor.execute('''CREATE TRIGGER IF NOT EXISTS templates_fts_delete AFTER DELETE ON templates
+            BEGIN
+                DELETE FROM templates_fts WHERE rowid = old.id;
+            END''')
+        
+        self._rebuild_search_index(cursor)
+        cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('search_index', 'fts5')")
+    
+    def _migrate_vacuum(self, cursor):
+        """遷移 5：回收正文遷移後舊正文欄位佔用的空間
+        
+        VACUUM 前先設置遷移 7 的 auto_vacuum=INCREMENTAL，同一次重寫使其生效，
+        升級舊數據庫時不必再由遷移 7 重寫一次整個文件。
+        """
+        size_before = os.path.getsize(self.db_file)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+        print(f"數據庫大小 {size_before} -> {os.path.getsize(self.db_file)} 字節")
+    
+    def _migrate_incremental_vacuum(self, cursor):
+        """遷移 7：開啟 auto_vacuum=INCREMENTAL，刪除數據後可由 incremental_vacuum 分步回收空間
+        
+        已有數據的數據庫需 VACUUM 一次才會生效。
+        """
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+        size_before = os.path.getsize(self.db_file)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+        print(f"數據庫大小 {size_before} -> {os.path.getsize(self.db_file)} 字節")
+    
+    def _migrate_template_revisions(self, cursor):
+        """遷移 6：模板修訂歷史，kind 為 full（完整快照）或 delta（相對上一修訂的差異）"""
+        cursor.execute('''CREATE TABLE IF NOT EXISTS template_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template_id INTEGER NOT NULL,
+            revision INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (template_id) REFERENCES templates(id) ON DELETE CASCADE,
+            UNIQUE (template_id, revision)
+        )''')
+
+    def _migrate_variable_positions(self, cursor):
+        """遷移 8：記錄變量在主題或正文中首次出現的順序和位置，並為現有模板補齊"""
+        columns = self._table_columns(cursor, 'template_variables')
+        if 'position' not in columns:
+            cursor.execute('ALTER TABLE template_variables ADD COLUMN position INTEGER')
+        if 'location' not in columns:
+            cursor.execute('ALTER TABLE template_variables ADD COLUMN location TEXT')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_template_variables_position
+                          ON template_variables(template_id, position)''')
+        
+        rows = cursor.execute(
+            f"""SELECT t.id, t.subject, {_BODY_SQL} AS body,
+                   (SELECT json_group_array(tv.variable_name) FROM template_variables tv
+                    WHERE tv.template_id = t.id) AS variables_json
+            FROM templates t
+            WHERE EXISTS (SELECT 1 FROM template_variables tv WHERE tv.template_id = t.id)"""
+        ).fetchall()
+        cursor.executemany(
+            "UPDATE template_variables SET position = ?, location = ? WHERE template_id = ? AND variable_name = ?",
+            [(position, location, row['id'], name)
+             for row in rows
+             for name, position, location in _variable_positions(row['subject'], row['body'],
+                                                                 json.loads(row['variables_json']))]
+        )
+        if rows:
+            print(f"已為 {len(rows)} 個模板記錄變量順序")
+    
+    def _migrate_change_counters(self, cursor):
+        """遷移 9：事件類型的模板修改計數，由觸發器在模板新增、修改和刪除時遞增
+        
+        updated_at 取自寫入端的本機時鐘，時鐘偏慢的機器修改模板後最後修改時間可能不變；
+        計數器不依賴時鐘，ChangeWatcher 用它判斷哪些事件類型有變化。
+        """
+        if 'change_count' not in self._table_columns(cursor, 'event_types'):
+            cursor.execute('ALTER TABLE event_types ADD COLUMN change_count INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('''CREATE TRIGGER IF NOT EXISTS event_types_count_insert AFTER INSERT ON templates
+            BEGIN
+                UPDATE event_types SET change_count = change_count + 1 WHERE id = new.event_type_id;
+            END''')
+        cursor.execute('''CREATE TRIGGER IF NOT EXISTS event_types_count_update AFTER UPDATE ON templates
+            BEGIN
+                UPDATE event_types SET change_count = change_count + 1
+                WHERE id IN (old.event_type_id, new.event_type_id);
+            END''')
+        cursor.execute('''CREATE TRIGGER IF NOT EXISTS event_types_count_delete AFTER DELETE ON templates
+            BEGIN
+                UPDATE event_types SET change_count = change_count + 1 WHERE id = old.event_type_id;
+            END''')
+    
+    def _migrate_revision_hashes(self, cursor):
+        """遷移 10：記錄每個修訂內容的哈希，保存時不必重建上一修訂即可判斷能否存差異
+        
+        舊修訂沒有哈希，遷移後每個模板的下一次修改保存為完整快照。
+        """
+        if 'content_hash' not in self._table_columns(cursor, 'template_revisions'):
+            cursor.execute('ALTER TABLE template_revisions ADD COLUMN content_hash TEXT')
+
+    def _migrate_revision_bodies(self, cursor):
+        """遷移 11：完整快照的正文改為引用 template_bodies，與模板共用同一份壓縮數據
+
+        正文在保存模板時已壓縮，修訂不再把它寫入自己的數據中重新壓縮一次。
+        正文表的釋放觸發器同時檢查修訂的引用，刪除修訂後也釋放不再被引用的正文。
+        """
+        if 'body_hash' not in self._table_columns(cursor, 'template_revisions'):
+            cursor.execute('ALTER TABLE template_revisions ADD COLUMN body_hash TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_template_revisions_body_hash ON template_revisions(body_hash)')
+        cursor.execute('DROP TRIGGER IF EXISTS template_bodies_release_delete')
+        cursor.execute('DROP TRIGGER IF EXISTS template_bodies_release_update')
+        cursor.execute('''CREATE TRIGGER template_bodies_release_delete AFTER DELETE ON templates
+            WHEN old.body_hash IS NOT NULL
+            BEGIN
+                DELETE FROM template_bodies WHERE hash = old.body_hash
+                    AND NOT EXISTS (SELECT 1 FROM templates WHERE body_hash = old.body_hash)
+                    AND NOT EXISTS (SELECT 1 FROM template_revisions WHERE body_hash = old.body_hash);
+            END''')
+        cursor.execute('''CREATE TRIGGER template_bodies_release_update AFTER UPDATE OF body_hash ON templates
+            WHEN old.body_hash IS NOT NULL AND old.body_hash IS NOT new.body_hash
+            BEGIN
+                DELETE FROM template_bodies WHERE hash = old.body_hash
+                    AND NOT EXISTS (SELECT 1 FROM templates WHERE body_hash = old.body_hash)
+                    AND NOT EXISTS (SELECT 1 FROM template_revisions WHERE body_hash = old.body_hash);
+            END''')
+        cursor.execute('''CREATE TRIGGER IF NOT EXISTS template_bodies_release_revision AFTER DELETE ON template_revisions
+            WHEN old.body_hash IS NOT NULL
+            BEGIN
+                DELETE FROM template_bodies WHERE hash = old.body_hash
+                    AND NOT EXISTS (SELECT 1 FROM templates WHERE body_hash = old.body_hash)
+                    AND NOT EXISTS (SELECT 1 FROM template_revisions WHERE body_hash = old.body_hash);
+            END''')
+
+    def _index_template(self, cursor, template_id: int, name: str, subject: str, note: str, tag: str, body: str):
+        """更新單個模板的全文索引，由保存路徑在同一事務中調用
+        
+        調用方傳入剛寫入的內容，不必再從正文表讀取並解壓正文。
+        """
+        if not self.fts_enabled:
+            return
+        cursor.execute("DELETE FROM templates_fts WHERE rowid = ?", (template_id,))
+        cursor.execute(
+            "INSERT INTO templates_fts (rowid, name, subject, note, tag, body) VALUES (?, ?, ?, ?, ?, ?)",
+            _search_index_row(template_id, name, subject, note, tag, body)
+        )
+
+    def _rebuild_search_index(self, cursor):
+        """從 templates 表重建全文索引"""
+        cursor.execute("DELETE FROM templates_fts")
+        rows = cursor.execute(
+            f"SELECT t.id, t.name, t.subject, t.note_en, t.tag_en, {_BODY_SQL} FROM templates t"
+        ).fetchall()
+        cursor.executemany(
+            "INSERT INTO templates_fts (rowid, name, subject, note, tag, body) VALUES (?, ?, ?, ?, ?, ?)",
+            (_search_index_row(*row) for row in rows)
+        )
+
+    def rebuild_search_index(self) -> bool:
+        """重建全文索引
+        
+        Returns:
+            bool: 是否成功重建
+        """
+        if not self.fts_enabled:
+            return False
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self._rebuild_search_index(cursor)
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"重建全文索引失敗: {e}")
+            return False
 
     # 设置相关方法
     def save_setting(self, key: str, value: str):
@@ -124,6 +927,11 @@ class DatabaseManager:
         
         conn.commit()
         
+        # 寫穿緩存，已加載時直接更新
+        with self._metadata_lock:
+            if self._metadata is not None:
+                self._metadata["settings"][key] = value
+        
     def add_app_info_translation(self, language_code: str, key: str, value: str):
         """添加或更新 app_info 多語言資訊"""
         conn = self.get_connection()
@@ -133,16 +941,54 @@ class DatabaseManager:
             (key, language_code, value)
         )
         conn.commit()
+        
+        with self._metadata_lock:
+            if self._metadata is not None:
+                self._metadata["app_info"].setdefault(language_code, {})[key] = value
 
     def get_app_info_translations(self, language_code: str) -> Dict[str, str]:
         """獲取指定語言所有 app_info 翻譯"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT key, value FROM app_info_translations WHERE language_code = ?",
-            (language_code,)
-        )
-        return {row['key']: row['value'] for row in cursor.fetchall()}
+        return dict(self._get_metadata()["app_info"].get(language_code, {}))
+    
+    def _get_metadata(self) -> Dict[str, Dict]:
+        """返回設置和應用信息緩存，首次調用時從數據庫一次性加載
+        
+        Returns:
+            Dict[str, Dict]: settings（鍵 -> 值）、app_info（語言 -> 鍵 -> 值）和
+                舊版 app_info 表的內容 legacy_app_info（鍵 -> 值）
+        """
+        with self._metadata_lock:
+            if self._metadata is None:
+                conn = self.get_connection()
+                cursor = conn.cursor()
+                
+                cursor.execute("SELECT key, value FROM settings")
+                settings = {row['key']: row['value'] for row in cursor.fetchall()}
+                
+                app_info = {}
+                cursor.execute("SELECT key, language_code, value FROM app_info_translations")
+                for row in cursor.fetchall():
+                    app_info.setdefault(row['language_code'], {})[row['key']] = row['value']
+                
+                # 只有舊版數據庫才有 app_info 表
+                legacy_app_info = {}
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'app_info'")
+                if cursor.fetchone():
+                    cursor.execute("SELECT key, value FROM app_info")
+                    legacy_app_info = {row['key']: row['value'] for row in cursor.fetchall()}
+                
+                self._metadata = {"settings": settings, "app_info": app_info, "legacy_app_info": legacy_app_info}
+            return self._metadata
+    
+    def invalidate_metadata_cache(self):
+        """清除設置和應用信息緩存"""
+        with self._metadata_lock:
+            self._metadata = None
+            self._fts_enabled = None
+    
+    def refresh_caches(self):
+        """數據庫被其他進程修改後調用，丟棄進程內緩存的數據"""
+        self.invalidate_metadata_cache()
     
     def _load_translations(self) -> Dict[str, Dict[str, str]]:
         translations = {}
@@ -166,13 +1012,7 @@ class DatabaseManager:
         Returns:
             Optional[str]: 设置值，如果不存在则返回默认值
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        result = cursor.fetchone()
-        
-        return result[0] if result else default
+        return self._get_metadata()["settings"].get(key, default)
     
     # 语言相关方法
     def add_language(self, code: str, description: str):
@@ -328,22 +1168,37 @@ class DatabaseManager:
             conn.execute("BEGIN")
             cursor.execute("SELECT id FROM templates WHERE event_type_id = ? AND name = ?", (event_type_id, name))
             existing = cursor.fetchone()
+            content_hash = _content_hash(recipient, cc, subject, body, note_en, tag_en, sender, variables)
+            body_hash = self._store_body(cursor, body)
             if existing:
-                cursor.execute("""UPDATE templates 
-                               SET recipient = ?, cc = ?, subject = ?, body = ?, note_en = ?, tag_en = ?, sender = ?
+                # 修改前的內容作為修訂差異的基準，沒有修訂記錄時先保存為第一個修訂
+                previous = self._current_snapshot(cursor, existing[0])
+                cursor.execute(f"""UPDATE templates 
+                               SET recipient = ?, cc = ?, subject = ?, body_hash = ?, note_en = ?, tag_en = ?, sender = ?,
+                                   updated_at = {_NOW_SQL}, content_hash = ?
                                WHERE id = ?""",
-                               (recipient, cc, subject, body, note_en, tag_en, sender, existing[0]))
+                               (recipient, cc, subject, body_hash, note_en, tag_en, sender, content_hash, existing[0]))
                 template_id = existing[0]
                 cursor.execute("DELETE FROM template_variables WHERE template_id = ?", (template_id,))
             else:
-                cursor.execute("""INSERT INTO templates 
-                                (event_type_id, name, recipient, cc, subject, body, note_en, tag_en, sender) 
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                               (event_type_id, name, recipient, cc, subject, body, note_en, tag_en, sender))
+                previous = None
+                cursor.execute(f"""INSERT INTO templates 
+                                (event_type_id, name, recipient, cc, subject, body_hash, note_en, tag_en, sender,
+                                 updated_at, content_hash) 
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {_NOW_SQL}, ?)""",
+                               (event_type_id, name, recipient, cc, subject, body_hash, note_en, tag_en, sender,
+                                content_hash))
                 template_id = cursor.lastrowid
-            for variable in variables:
-                cursor.execute("INSERT INTO template_variables (template_id, variable_name) VALUES (?, ?)",
-                               (template_id, variable))
+            positions = _variable_positions(subject, body, variables)
+            cursor.executemany(
+                "INSERT INTO template_variables (template_id, variable_name, position, location) VALUES (?, ?, ?, ?)",
+                [(template_id, name, position, location) for name, position, location in positions]
+            )
+            self._index_template(cursor, template_id, name, subject, note_en, tag_en, body)
+            self._record_revision(cursor, template_id, {
+                "to": recipient, "cc": cc, "subject": subject, "body": body, "note_en": note_en,
+                "tag_en": tag_en, "sender": sender, "variables": [name for name, _, _ in positions],
+            }, previous)
             conn.commit()
             return template_id
         except sqlite3.Error as e:
@@ -351,11 +1206,215 @@ class DatabaseManager:
             print(f"DB error: {e}")
             return None
     
+    def _current_snapshots(self, cursor, template_ids: List[int]) -> Dict[int, Dict]:
+        """批量讀取模板當前內容，格式與修訂快照相同，返回模板ID到快照的映射"""
+        snapshots = {}
+        for start in range(0, len(template_ids), _LOOKUP_BATCH):
+            batch = template_ids[start:start + _LOOKUP_BATCH]
+            cursor.execute(
+                f"""SELECT t.id, t.recipient as "to", t.cc, t.subject, {_BODY_COLUMN}, t.note_en, t.tag_en, t.sender,
+                       {_VARIABLES_COLUMN}
+                FROM templates t WHERE t.id IN ({', '.join('?' * len(batch))})""",
+                batch
+            )
+            for row in cursor.fetchall():
+                snapshot = dict(row)
+                snapshot['variables'] = self._variables_from_row(snapshot)
+                snapshots[row['id']] = {field: snapshot[field] for field in _REVISION_FIELDS}
+        return snapshots
+    
+    def _current_snapshot(self, cursor, template_id: int) -> Optional[Dict]:
+        """讀取模板當前內容，格式與修訂快照相同"""
+        return self._current_snapshots(cursor, [template_id]).get(template_id)
+    
+    def _record_revision(self, cursor, template_id: int, snapshot: Dict,
+                         previous: Optional[Dict] = None) -> Optional[int]:
+        """保存一個修訂，內容與上一修訂相同時跳過
+        
+        差異以調用方傳入的修改前內容為基準，只有其哈希與上一修訂相同時才使用，不必重建上一修訂。
+        沒有修改前內容、距上一個完整快照已有 KEYFRAME_INTERVAL - 1 個差異，
+        或 _revision_delta 判斷不值得存差異時，保存完整快照。
+        
+        Args:
+            cursor: 當前事務的游標
+            template_id (int): 模板ID
+            snapshot (Dict): 模板內容，鍵為 _REVISION_FIELDS
+            previous (Dict, optional): 修改前的模板內容；模板還沒有修訂記錄時先把它保存為第一個修訂，
+                確保這次修改可以撤銷
+        
+        Returns:
+            Optional[int]: 新修訂號，內容與上一修訂相同時不保存並返回 None
+        """
+        snapshot = _revision_snapshot(snapshot)
+        previous = _revision_snapshot(previous) if previous is not None else None
+        if previous == snapshot:
+            return None
+        content_hash = _snapshot_hash(snapshot)
+        cursor.execute(
+            """SELECT revision, content_hash,
+                   (SELECT MAX(revision) FROM template_revisions
+                    WHERE template_id = ? AND kind = 'full') AS keyframe
+            FROM template_revisions WHERE template_id = ? ORDER BY revision DESC LIMIT 1""",
+            (template_id, template_id)
+        )
+        last = cursor.fetchone()
+        
+        if last is None and previous is not None:
+            self._record_revision(cursor, template_id, previous)
+            return self._record_revision(cursor, template_id, snapshot, previous)
+        if last is None:
+            revision = 1
+            payload = {"fields": snapshot}
+        else:
+            if last['content_hash'] == content_hash:
+                return None
+            revision = last['revision'] + 1
+            payload = None
+            # 模板當前內容與上一修訂一致（沒有被不記錄修訂的程序改過）時才能以它為基準存差異
+            if previous is not None and revision - last['keyframe'] < KEYFRAME_INTERVAL \
+                    and _snapshot_hash(previous) == last['content_hash']:
+                payload = _revision_delta(previous, snapshot)
+            if payload is None:
+                payload = {"fields": snapshot}
+        
+        kind = "delta" if "body" in payload else "full"
+        body_hash = None
+        if kind == "full":
+            # 完整快照的正文引用 template_bodies，保存模板時已壓縮的正文不再重複壓縮
+            fields = dict(payload["fields"])
+            body_hash = self._store_body(cursor, fields.pop("body"))
+            payload = {"fields": fields}
+        data = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                             BODY_ZLIB_LEVEL)
+        cursor.execute(
+            f"""INSERT INTO template_revisions
+            (template_id, revision, kind, data, size, created_at, content_hash, body_hash)
+            VALUES (?, ?, ?, ?, ?, {_NOW_SQL}, ?, ?)""",
+            (template_id, revision, kind, data, len(data), content_hash, body_hash)
+        )
+        return revision
+    
+    def _load_revision(self, cursor, template_id: int, revision: int) -> Optional[Dict]:
+        """從最近的完整快照開始依次應用差異，重建指定修訂"""
+        cursor.execute(
+            """SELECT r.revision, r.kind, r.data, r.body_hash, b.codec AS body_codec, b.data AS body_data
+            FROM template_revisions r
+            LEFT JOIN template_bodies b ON b.hash = r.body_hash
+            WHERE r.template_id = ? AND r.revision <= ?
+              AND r.revision >= (SELECT MAX(revision) FROM template_revisions
+                                 WHERE template_id = ? AND revision <= ? AND kind = 'full')
+            ORDER BY r.revision""",
+            (template_id, revision, template_id, revision)
+        )
+        rows = cursor.fetchall()
+        if not rows or rows[-1]['revision'] != revision:
+            return None
+        
+        snapshot = None
+        body_tokens = None
+        for row in rows:
+            payload = json.loads(zlib.decompress(row['data']).decode('utf-8'))
+            if row['kind'] == "full":
+                snapshot = payload["fields"]
+                # 遷移 11 之前的完整快照把正文保存在自身數據中
+                if row['body_hash'] is not None:
+                    snapshot["body"] = _decode_body(row['body_codec'], row['body_data'])
+                snapshot["body"] = snapshot.get("body") or ""
+                body_tokens = None
+            else:
+                snapshot.update(payload["fields"])
+                # 只有需要應用差異時才切分正文
+                if body_tokens is None:
+                    body_tokens = _tokenize_body(snapshot["body"])
+                body_tokens = _apply_body_diff(body_tokens, payload["body"])
+        if body_tokens is not None:
+            snapshot["body"] = "".join(body_tokens)
+        return snapshot
+    
+    def get_template_revisions(self, template_id: int) -> List[Dict]:
+        """列出模板的修訂記錄
+        
+        Args:
+            template_id (int): 模板ID
+        
+        Returns:
+            List[Dict]: 每項含 revision、kind（full/delta）、size（存儲字節數，完整快照與模板共用的正文不計入）
+                和 created_at，按修訂號排序
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT revision, kind, size, created_at FROM template_revisions
+            WHERE template_id = ? ORDER BY revision""",
+            (template_id,)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_template_revision(self, template_id: int, revision: int) -> Optional[Dict]:
+        """獲取模板某個修訂的內容
+        
+        Args:
+            template_id (int): 模板ID
+            revision (int): 修訂號
+        
+        Returns:
+            Optional[Dict]: 含 to/cc/subject/body/note_en/tag_en/sender/variables 的字典，修訂不存在時返回 None
+        """
+        conn = self.get_connection()
+        return self._load_revision(conn.cursor(), template_id, revision)
+    
+    def restore_template_revision(self, template_id: int, revision: int) -> bool:
+        """把模板恢復到某個修訂的內容，恢復本身會保存為新的修訂
+        
+        Args:
+            template_id (int): 模板ID
+            revision (int): 修訂號
+        
+        Returns:
+            bool: 是否成功恢復
+        """
+        snapshot = self.get_template_revision(template_id, revision)
+        template = self.get_template(template_id)
+        if snapshot is None or template is None:
+            return False
+        return self.add_template(
+            template['event_type_id'], template['name'], snapshot['to'], snapshot['cc'],
+            snapshot['subject'], snapshot['body'], snapshot['variables'], snapshot['note_en'],
+            snapshot['tag_en'], snapshot['sender']
+        ) is not None
+    
+    @staticmethod
+    def _variables_from_row(template_dict: Dict) -> List[str]:
+        """取出并解析行中的 variables_json 欄位
+        
+        Args:
+            template_dict (Dict): 含 variables_json 鍵的模板字典，該鍵會被移除
+        
+        Returns:
+            List[str]: 變量名列表
+        """
+        return json.loads(template_dict.pop('variables_json', None) or '[]')
+    
+    def get_template_variables(self, template_id: int) -> List[Dict]:
+        """獲取模板變量及其在模板中的位置
+        
+        Args:
+            template_id (int): 模板ID
+        
+        Returns:
+            List[Dict]: 按首次出現順序排列，每項含 name、position 和 location（subject、body 或 None）
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""SELECT variable_name AS name, position, location FROM template_variables
+                          WHERE template_id = ? ORDER BY position""", (template_id,))
+        return [dict(row) for row in cursor.fetchall()]
+    
     def get_template(self, template_id: int) -> Optional[Dict]:
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute("""SELECT t.id, t.event_type_id, t.name, t.recipient, t.cc, t.subject, t.body, t.note_en, t.tag_en, t.sender,
-                               et.name as event_type_name
+        cursor.execute(f"""SELECT t.id, t.event_type_id, t.name, t.recipient, t.cc, t.subject, {_BODY_COLUMN}, t.note_en, t.tag_en, t.sender,
+                               t.content_hash, et.name as event_type_name, {_VARIABLES_COLUMN}
                           FROM templates t
                           JOIN event_types et ON t.event_type_id = et.id
                           WHERE t.id = ?""", (template_id,))
@@ -363,14 +1422,14 @@ class DatabaseManager:
         if not template:
             return None
         template_dict = dict(template)
-        cursor.execute("SELECT variable_name FROM template_variables WHERE template_id = ?", (template_id,))
-        template_dict['variables'] = [row[0] for row in cursor.fetchall()]
+        template_dict['variables'] = self._variables_from_row(template_dict)
         return template_dict
     
     def get_template_by_name(self, event_type: str, template_name: str) -> Optional[Dict]:
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute("""SELECT t.id, t.event_type_id, t.name, t.recipient as recipient, t.cc, t.subject, t.body, t.note_en, t.tag_en, t.sender
+        cursor.execute(f"""SELECT t.id, t.event_type_id, t.name, t.recipient as recipient, t.cc, t.subject, {_BODY_COLUMN}, t.note_en, t.tag_en, t.sender,
+                               t.content_hash, {_VARIABLES_COLUMN}
                           FROM templates t
                           JOIN event_types et ON t.event_type_id = et.id
                           WHERE et.name = ? AND t.name = ?""", (event_type, template_name))
@@ -381,8 +1440,7 @@ class DatabaseManager:
         if 'recipient' in template_dict:
             template_dict['to'] = template_dict['recipient']
             del template_dict['recipient']
-        cursor.execute("SELECT variable_name FROM template_variables WHERE template_id = ?", (template_dict['id'],))
-        template_dict['variables'] = [row[0] for row in cursor.fetchall()]
+        template_dict['variables'] = self._variables_from_row(template_dict)
         return template_dict
         
     def get_templates_for_event(self, event_type: str) -> List[Dict]:
@@ -398,7 +1456,8 @@ class DatabaseManager:
         cursor = conn.cursor()
         
         cursor.execute(
-            """SELECT t.id, t.name, t.recipient, t.cc, t.subject, t.body, t.note_en, t.tag_en, t.sender
+            f"""SELECT t.id, t.name, t.recipient, t.cc, t.subject, {_BODY_COLUMN}, t.note_en, t.tag_en, t.sender,
+                   {_VARIABLES_COLUMN}
             FROM templates t
             JOIN event_types et ON t.event_type_id = et.id
             WHERE et.name = ?""",
@@ -414,17 +1473,35 @@ class DatabaseManager:
                 template_dict['to'] = template_dict['recipient']
                 del template_dict['recipient']
             
-            # 獲取變量
-            cursor.execute(
-                "SELECT variable_name FROM template_variables WHERE template_id = ?",
-                (template_dict['id'],)
-            )
-            
-            template_dict['variables'] = [row[0] for row in cursor.fetchall()]
+            # 變量已由同一查詢聚合取回
+            template_dict['variables'] = self._variables_from_row(template_dict)
             templates.append(template_dict)
         
         return templates
     
+    def get_template_summaries(self, event_type: str) -> List[Dict]:
+        """獲取指定事件類型的模板摘要，不讀取正文、收件人和變量
+        
+        Args:
+            event_type (str): 事件類型名稱
+        
+        Returns:
+            List[Dict]: 模板摘要列表，每項包含 id、name、tag_en 和 updated_at
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT t.id, t.name, t.tag_en, t.updated_at
+            FROM templates t
+            JOIN event_types et ON t.event_type_id = et.id
+            WHERE et.name = ?
+            ORDER BY t.id""",
+            (event_type,)
+        )
+        
+        return [dict(row) for row in cursor.fetchall()]
+    
     def get_template_names_for_event(self, event_type: str) -> List[str]:
         """获取指定事件类型的所有模板名称
         
@@ -493,63 +1570,257 @@ class DatabaseManager:
             conn.rollback()
             return False
     
-    def search_templates(self, keyword: str) -> List[Dict]:
-        """搜索包含關鍵字的模板
+    def rename_event_type(self, old_name: str, new_name: str) -> bool:
+        """重命名事件類型，只更新一行，模板ID和內容保持不變
         
         Args:
-            keyword (str): 搜索關鍵字
+            old_name (str): 舊事件類型名稱
+            new_name (str): 新事件類型名稱
         
         Returns:
-            List[Dict]: 模板列表
+            bool: 是否成功重命名，舊名稱不存在或新名稱已存在時返回 False
         """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # 使用LIKE進行模糊匹配
-        keyword = f"%{keyword}%"
-        
-        cursor.execute(
-            """SELECT t.id, t.name, t.recipient, t.cc, t.subject, t.body, t.note_en, t.tag_en, t.sender, et.name as event_type
-            FROM templates t
-            JOIN event_types et ON t.event_type_id = et.id
-            WHERE t.name LIKE ? OR t.subject LIKE ? OR t.body LIKE ?""",
-            (keyword, keyword, keyword)
-        )
+        try:
+            cursor.execute("UPDATE event_types SET name = ? WHERE name = ?", (new_name, old_name))
+            conn.commit()
+            return cursor.rowcount > 0
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            print(f"事件類型 '{new_name}' 已存在")
+            return False
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"重命名事件類型失敗: {e}")
+            return False
+    
+    def _relocate_template(self, event_type: str, template_name: str, target_event_type: str,
+                           target_name: str, overwrite: bool,
+                           before_commit: Optional[Callable[[], bool]] = None,
+                           on_rollback: Optional[Callable[[], None]] = None) -> bool:
+        """在一個事務中更新模板的事件類型和名稱，模板ID保持不變
+        
+        目標位置已有同名模板時，overwrite 為 True 則先刪除該模板，否則不做任何修改。
+        before_commit 在提交前調用，返回 False 時回滾整個操作；
+        before_commit 被調用後事務回滾（包括提交失敗）時調用 on_rollback，撤銷其外部操作。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        before_commit_called = False
         
-        results = []
-        for template in cursor.fetchall():
-            template_dict = dict(template)
+        try:
+            conn.execute("BEGIN")
+            cursor.execute(
+                """SELECT t.id FROM templates t
+                   JOIN event_types et ON t.event_type_id = et.id
+                   WHERE et.name = ? AND t.name = ?""",
+                (event_type, template_name)
+            )
+            source = cursor.fetchone()
+            if source is None:
+                conn.rollback()
+                return False
             
-            # 修改鍵名以匹配預期輸出
-            if 'recipient' in template_dict:
-                template_dict['to'] = template_dict['recipient']
-                del template_dict['recipient']
+            cursor.execute("INSERT OR IGNORE INTO event_types (name) VALUES (?)", (target_event_type,))
+            cursor.execute("SELECT id FROM event_types WHERE name = ?", (target_event_type,))
+            target_event_type_id = cursor.fetchone()[0]
             
-            # 獲取變量
             cursor.execute(
-                "SELECT variable_name FROM template_variables WHERE template_id = ?",
-                (template_dict['id'],)
+                "SELECT id FROM templates WHERE event_type_id = ? AND name = ?",
+                (target_event_type_id, target_name)
             )
+            existing = cursor.fetchone()
+            if existing is not None and existing[0] != source[0]:
+                if not overwrite:
+                    conn.rollback()
+                    return False
+                cursor.execute("DELETE FROM templates WHERE id = ?", (existing[0],))
             
-            template_dict['variables'] = [row[0] for row in cursor.fetchall()]
-            # 構造返回格式與JSON版一致
-            results.append({
-                "event_type": template_dict['event_type'],
-                "template": {
-                    "name": template_dict['name'],
-                    "to": template_dict['to'],
-                    "cc": template_dict['cc'],
-                    "subject": template_dict['subject'],
-                    "body": template_dict['body'],
-                    "variables": template_dict['variables'],
-                    "note_en": template_dict['note_en'],
-                    "tag_en": template_dict['tag_en'],
-                    "sender": template_dict['sender'],  # 添加 sender 欄位
-                }
-            })
+            cursor.execute(
+                f"UPDATE templates SET event_type_id = ?, name = ?, updated_at = {_NOW_SQL} WHERE id = ?",
+                (target_event_type_id, target_name, source[0])
+            )
+            if target_name != template_name and self.fts_enabled:
+                # 只有名稱改變，FTS5 保留其餘欄位，無需讀取正文
+                cursor.execute("UPDATE templates_fts SET name = ? WHERE rowid = ?",
+                               (_segment_cjk(target_name), source[0]))
+            if before_commit is not None:
+                before_commit_called = True
+                if not before_commit():
+                    conn.rollback()
+                    if on_rollback is not None:
+                        on_rollback()
+                    return False
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            if before_commit_called and on_rollback is not None:
+                on_rollback()
+            print(f"移動模板失敗: {e}")
+            return False
+    
+    def move_template(self, source_event_type: str, target_event_type: str, template_name: str,
+                      overwrite: bool = False) -> bool:
+        """把模板移動到另一個事件類型（目標事件類型不存在時創建）
         
+        Args:
+            source_event_type (str): 源事件類型名稱
+            target_event_type (str): 目標事件類型名稱
+            template_name (str): 模板名稱
+            overwrite (bool): 目標事件類型中已有同名模板時是否覆蓋
+        
+        Returns:
+            bool: 是否成功移動
+        """
+        return self._relocate_template(source_event_type, template_name, target_event_type,
+                                       template_name, overwrite)
+    
+    def rename_template(self, event_type: str, old_name: str, new_name: str, overwrite: bool = False,
+                        before_commit: Optional[Callable[[], bool]] = None,
+                        on_rollback: Optional[Callable[[], None]] = None) -> bool:
+        """重命名模板
+        
+        Args:
+            event_type (str): 事件類型名稱
+            old_name (str): 舊模板名稱
+            new_name (str): 新模板名稱
+            overwrite (bool): 已有同名模板時是否覆蓋
+            before_commit (Callable, optional): 提交前調用（如重命名圖片目錄），返回 False 時回滾
+            on_rollback (Callable, optional): before_commit 已調用但操作回滾（包括提交失敗）時調用，
+                用於撤銷 before_commit 的修改
+        
+        Returns:
+            bool: 是否成功重命名
+        """
+        return self._relocate_template(event_type, old_name, event_type, new_name, overwrite,
+                                       before_commit, on_rollback)
+    
+    def _search_query_parts(self, keyword: str, event_type: Optional[str] = None):
+        """構造搜索語句的 FROM/WHERE/ORDER BY 部分，事件類型過濾在SQL中完成
+        
+        Args:
+            keyword (str): 搜索關鍵字
+            event_type (str, optional): 只搜索該事件類型
+        
+        Returns:
+            tuple: (from_sql, where_sql, order_sql, params, use_fts)
+        """
+        match_query = _build_match_query(keyword) if self.fts_enabled else ""
+        conditions = []
+        params = []
+        if match_query:
+            # CROSS JOIN 固定以全文索引為外層循環，避免按事件類型逐行重複執行 MATCH
+            from_sql = """FROM templates_fts
+                CROSS JOIN templates t ON t.id = templates_fts.rowid
+                CROSS JOIN event_types et ON t.event_type_id = et.id"""
+            # 名稱權重最高，其次是主題、備註和標籤，正文最低；
+            # 按 rank 排序由 FTS5 直接按相關度輸出，分頁時只為當頁結果計算摘要
+            conditions.append("templates_fts MATCH ? AND rank MATCH 'bm25(10.0, 5.0, 2.0, 2.0, 1.0)'")
+            params.append(match_query)
+            order_sql = "ORDER BY rank"
+        else:
+            from_sql = """FROM templates t
+                JOIN event_types et ON t.event_type_id = et.id"""
+            if keyword:
+                # 使用LIKE進行模糊匹配
+                like = f"%{keyword}%"
+                conditions.append(f"(t.name LIKE ? OR t.subject LIKE ? OR {_BODY_SQL} LIKE ?)")
+                params.extend([like, like, like])
+            order_sql = "ORDER BY t.id"
+        if event_type is not None:
+            conditions.append("et.name = ?")
+            params.append(event_type)
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return from_sql, where_sql, order_sql, params, bool(match_query)
+    
+    def search_templates_page(self, keyword: str, event_type: Optional[str] = None,
+                              columns: Optional[List[str]] = None, limit: Optional[int] = 50,
+                              offset: int = 0) -> List[Dict]:
+        """分頁搜索模板，只返回指定欄位
+        
+        Args:
+            keyword (str): 搜索關鍵字，為空時返回全部模板
+            event_type (str, optional): 只搜索該事件類型，其他事件類型的結果不會被讀取
+            columns (List[str], optional): 返回的欄位，可選 _SEARCH_COLUMNS 中的鍵，默認為 id 和 name
+            limit (int, optional): 每頁數量，None 表示不限制
+            offset (int): 跳過的結果數量
+        
+        Returns:
+            List[Dict]: 按相關度排序的模板字典，只含所請求的欄位
+        
+        Raises:
+            ValueError: 請求了不支持的欄位
+        """
+        columns = list(columns) if columns else ["id", "name"]
+        unknown = [column for column in columns if column not in _SEARCH_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unsupported search columns: {', '.join(unknown)}")
+        
+        from_sql, where_sql, order_sql, params, use_fts = self._search_query_parts(keyword, event_type)
+        select_sql = ", ".join(
+            f'{_SEARCH_COLUMNS[column] if use_fts or column != "snippet" else "NULL"} AS "{column}"'
+            for column in columns
+        )
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT ? OFFSET ?"
+            params = params + [limit, offset]
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {select_sql} {from_sql} {where_sql} {order_sql} {limit_sql}", params)
+        
+        results = []
+        for row in cursor.fetchall():
+            template_dict = dict(row)
+            if "variables" in template_dict:
+                template_dict["variables"] = json.loads(template_dict["variables"] or "[]")
+            if "snippet" in template_dict:
+                template_dict["snippet"] = _join_cjk(template_dict["snippet"])
+            results.append(template_dict)
         return results
     
+    def count_search_results(self, keyword: str, event_type: Optional[str] = None) -> int:
+        """統計搜索結果總數，不讀取模板內容
+        
+        Args:
+            keyword (str): 搜索關鍵字
+            event_type (str, optional): 只統計該事件類型
+        
+        Returns:
+            int: 匹配的模板數量
+        """
+        from_sql, where_sql, _, params, _ = self._search_query_parts(keyword, event_type)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) {from_sql} {where_sql}", params)
+        return cursor.fetchone()[0]
+    
+    def search_templates(self, keyword: str) -> List[Dict]:
+        """搜索包含關鍵字的模板，結果按相關度排序
+        
+        使用全文索引匹配名稱、主題、備註、標籤和去除標記後的正文，
+        每個詞支持前綴匹配；全文索引不可用或關鍵字為空時回退到 LIKE。
+        
+        Args:
+            keyword (str): 搜索關鍵字
+        
+        Returns:
+            List[Dict]: 模板列表，template 中的 snippet 為高亮的匹配摘要
+        """
+        rows = self.search_templates_page(
+            keyword,
+            columns=["event_type", "name", "to", "cc", "subject", "body", "variables",
+                     "note_en", "tag_en", "sender", "snippet"],
+            limit=None
+        )
+        
+        # 構造返回格式與JSON版一致
+        return [{"event_type": row.pop("event_type"), "template": row} for row in rows]
+    
     # 导入导出方法
     def export_templates(self) -> Dict:
         """導出所有模板
@@ -561,52 +1832,115 @@ class DatabaseManager:
         cursor = conn.cursor()
         
         # 獲取所有事件類型
-        cursor.execute("SELECT id, name FROM event_types")
-        event_types = cursor.fetchall()
+        cursor.execute("SELECT id, name FROM event_types ORDER BY id")
+        event_type_names = {row['id']: row['name'] for row in cursor.fetchall()}
+        templates_by_event_type = {event_type_id: [] for event_type_id in event_type_names}
         
-        result = {"event_types": []}
+        # 一次取回所有模板及其變量，按事件類型分組
+        cursor.execute(
+            f"""SELECT t.id, t.event_type_id, t.name, t.recipient as "to", t.cc, t.subject, {_BODY_COLUMN}, t.note_en, t.tag_en, t.sender,
+                   {_VARIABLES_COLUMN}
+            FROM templates t
+            ORDER BY t.event_type_id, t.id"""
+        )
         
-        for event_type in event_types:
-            event_type_id = event_type['id']
-            event_type_name = event_type['name']
+        for template in cursor:
+            template_dict = dict(template)
+            variables = self._variables_from_row(template_dict)
+            event_type_id = template_dict.pop('event_type_id')
             
-            # 獲取該事件類型下的所有模板
-            cursor.execute(
-                """SELECT id, name, recipient as to, cc, subject, body, note_en, tag_en, sender
-                FROM templates
-                WHERE event_type_id = ?""",
-                (event_type_id,)
-            )
+            # 移除id欄位
+            del template_dict['id']
             
-            templates = []
-            for template in cursor.fetchall():
-                template_dict = dict(template)
-                
-                # 獲取變量
-                cursor.execute(
-                    "SELECT variable_name FROM template_variables WHERE template_id = ?",
-                    (template_dict['id'],)
-                )
-                
-                variables = [row[0] for row in cursor.fetchall()]
-                
-                # 移除id欄位
-                del template_dict['id']
-                
-                templates.append({
+            if event_type_id in templates_by_event_type:
+                templates_by_event_type[event_type_id].append({
                     **template_dict,
                     "variables": variables
                 })
-            
+        
+        result = {"event_types": []}
+        for event_type_id, templates in templates_by_event_type.items():
             result["event_types"].append({
-                "name": event_type_name,
+                "name": event_type_names[event_type_id],
                 "templates": templates
             })
         
         return result
     
+    def _export_filter(self, event_type: Optional[str] = None, tag: Optional[str] = None):
+        """構造導出語句的 WHERE 子句和參數"""
+        conditions = []
+        params = []
+        if event_type is not None:
+            conditions.append("et.name = ?")
+            params.append(event_type)
+        if tag is not None:
+            conditions.append("t.tag_en = ?")
+            params.append(tag)
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where_sql, params
+    
+    def count_templates(self, event_type: Optional[str] = None, tag: Optional[str] = None) -> int:
+        """統計模板數量，可按事件類型和標籤過濾
+        
+        Args:
+            event_type (str, optional): 事件類型名稱
+            tag (str, optional): 標籤
+        
+        Returns:
+            int: 模板數量
+        """
+        where_sql, params = self._export_filter(event_type, tag)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT COUNT(*)
+            FROM templates t
+            JOIN event_types et ON t.event_type_id = et.id
+            {where_sql}""",
+            params
+        )
+        return cursor.fetchone()[0]
+    
+    def iter_templates(self, event_type: Optional[str] = None, tag: Optional[str] = None,
+                       batch_size: int = 100):
+        """逐批讀取模板用於流式導出，內存佔用與模板總數無關
+        
+        Args:
+            event_type (str, optional): 只導出該事件類型
+            tag (str, optional): 只導出該標籤的模板
+            batch_size (int): 每次從游標讀取的行數
+        
+        Yields:
+            Dict: 含 event_type 和模板欄位的字典，格式與導入一致
+        """
+        where_sql, params = self._export_filter(event_type, tag)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        # 按唯一索引 (event_type_id, name) 的順序讀取，避免SQLite為排序緩存所有正文
+        cursor.execute(
+            f"""SELECT et.name as event_type, t.name, t.recipient as "to", t.cc, t.subject, {_BODY_COLUMN},
+                   t.note_en, t.tag_en, t.sender, {_VARIABLES_COLUMN}
+            FROM templates t
+            JOIN event_types et ON t.event_type_id = et.id
+            {where_sql}
+            ORDER BY t.event_type_id, t.name""",
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                template_dict = dict(row)
+                template_dict['variables'] = self._variables_from_row(template_dict)
+                yield template_dict
+    
     def import_templates(self, data: Dict) -> bool:
-        """導入模板
+        """導入模板，以導入數據替換全部事件類型和模板
+        
+        只刪除導入數據中沒有的事件類型和模板；同名模板原地更新，保留其ID和修訂歷史，
+        內容有變化時與 add_template 一樣記錄新修訂。
         
         Args:
             data (Dict): 包含事件類型和模板的字典
@@ -624,48 +1958,30 @@ class DatabaseManager:
             # 開始事務
             conn.execute("BEGIN")
             
-            # 清空現有數據
-            cursor.execute("DELETE FROM template_variables")
-            cursor.execute("DELETE FROM templates")
-            cursor.execute("DELETE FROM event_types")
+            # 同名模板以最後一條為準
+            imported = {}
+            for event_type in data["event_types"]:
+                imported.setdefault(event_type["name"], {}).update(
+                    (template["name"], template) for template in event_type["templates"])
+            event_type_ids = {}
+            self._resolve_event_type_ids(cursor, imported, event_type_ids)
+            
+            # 刪除導入數據中沒有的事件類型和模板，其變量、索引和修訂隨之級聯刪除
+            cursor.execute("SELECT id, name FROM event_types")
+            cursor.executemany("DELETE FROM event_types WHERE id = ?",
+                               [(row['id'],) for row in cursor.fetchall() if row['name'] not in imported])
+            keep = {(event_type_ids[event_type_name], name)
+                    for event_type_name, templates in imported.items() for name in templates}
+            cursor.execute("SELECT id, event_type_id, name FROM templates")
+            cursor.executemany("DELETE FROM templates WHERE id = ?",
+                               [(row['id'],) for row in cursor.fetchall()
+                                if (row['event_type_id'], row['name']) not in keep])
             
             # 導入事件類型和模板
-            for event_type in data["event_types"]:
-                event_type_name = event_type["name"]
-                
-                # 添加事件類型
-                cursor.execute(
-                    "INSERT INTO event_types (name) VALUES (?)",
-                    (event_type_name,)
-                )
-                event_type_id = cursor.lastrowid
-                
-                # 添加模板
-                for template in event_type["templates"]:
-                    cursor.execute(
-                        """INSERT INTO templates 
-                        (event_type_id, name, recipient, cc, subject, body, note_en, tag_en, sender) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                        (
-                            event_type_id, 
-                            template["name"], 
-                            template.get("to", ""), 
-                            template.get("cc", ""), 
-                            template.get("subject", ""), 
-                            template.get("body", ""),
-                            template.get("note_en", ""),
-                            template.get("tag_en", ""),
-                            template.get("sender", "")
-                        )
-                    )
-                    template_id = cursor.lastrowid
-                    
-                    # 添加變量
-                    for variable in template.get("variables", []):
-                        cursor.execute(
-                            "INSERT INTO template_variables (template_id, variable_name) VALUES (?, ?)",
-                            (template_id, variable)
-                        )
+            rows = [(event_type_ids[event_type_name], name, template)
+                    for event_type_name, templates in imported.items() for name, template in templates.items()]
+            for start in range(0, len(rows), _LOOKUP_BATCH):
+                self._upsert_templates(cursor, rows[start:start + _LOOKUP_BATCH])
             
             conn.commit()
             return True
@@ -675,6 +1991,224 @@ class DatabaseManager:
             print(f"導入失敗: {e}")
             return False
         
+    @staticmethod
+    def _template_values(template: Dict) -> tuple:
+        """按 templates 表欄位順序取出導入記錄中的內容欄位"""
+        return (
+            template.get("to", ""),
+            template.get("cc", ""),
+            template.get("subject", ""),
+            template.get("body", ""),
+            template.get("note_en", ""),
+            template.get("tag_en", ""),
+            template.get("sender", ""),
+        )
+    
+    def _store_bodies(self, cursor, bodies: List[Optional[str]]) -> List[Optional[str]]:
+        """批量保存正文，返回與輸入一一對應的哈希；已存在的正文不再壓縮"""
+        hashes = [hashlib.sha256(body.encode('utf-8')).hexdigest() if body else None for body in bodies]
+        pending = {body_hash: body for body_hash, body in zip(hashes, bodies) if body_hash}
+        
+        existing = set()
+        pending_hashes = list(pending)
+        for start in range(0, len(pending_hashes), _LOOKUP_BATCH):
+            batch = pending_hashes[start:start + _LOOKUP_BATCH]
+            cursor.execute(
+                f"SELECT hash FROM template_bodies WHERE hash IN ({', '.join('?' * len(batch))})",
+                batch
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+        
+        rows = []
+        for body_hash, body in pending.items():
+            if body_hash not in existing:
+                codec, data = _encode_body(body)
+                rows.append((body_hash, codec, data, len(body)))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO template_bodies (hash, codec, data, size) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        return hashes
+    
+    def _lookup_templates(self, cursor, keys: List[tuple]) -> Dict[tuple, sqlite3.Row]:
+        """按 (event_type_id, name) 批量查找模板，返回鍵到 (id, content_hash) 行的映射"""
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            values_sql = ", ".join("(?, ?)" for _ in batch)
+            cursor.execute(
+                f"""SELECT t.id, t.event_type_id, t.name, t.content_hash
+                FROM (VALUES {values_sql}) AS k
+                JOIN templates t ON t.event_type_id = k.column1 AND t.name = k.column2""",
+                [value for key in batch for value in key]
+            )
+            for row in cursor.fetchall():
+                found[(row['event_type_id'], row['name'])] = row
+        return found
+    
+    def _upsert_templates(self, cursor, rows: List[tuple],
+                          existing: Optional[Dict[tuple, sqlite3.Row]] = None) -> List[int]:
+        """在當前事務中插入或更新一批模板，並重寫其變量和全文索引
+        
+        與 add_template 一樣記錄修訂：新模板保存為第一個修訂；被更新的模板沒有修訂記錄時
+        先保存原內容，再保存新內容。
+        
+        Args:
+            cursor: 當前事務的游標
+            rows (List[tuple]): (event_type_id, 模板名稱, 模板字典) 列表，同一模板在批內只出現一次
+            existing (Dict, optional): 調用方已用 _lookup_templates 查到的現有模板，未提供時在此查找
+        
+        Returns:
+            List[int]: 與輸入對應的模板ID
+        """
+        if not rows:
+            return []
+        if existing is None:
+            existing = self._lookup_templates(cursor, [(event_type_id, name) for event_type_id, name, _ in rows])
+        # 覆蓋前一次讀取原內容，作為修訂差異的基準；沒有修訂記錄的模板先保存原內容，合併或批量導入後仍可恢復
+        previous = self._current_snapshots(cursor, [existing[(event_type_id, name)]['id']
+                                                    for event_type_id, name, _ in rows
+                                                    if (event_type_id, name) in existing])
+        contents = [self._template_values(template) for _, _, template in rows]
+        body_hashes = self._store_bodies(cursor, [values[3] for values in contents])
+        cursor.executemany(
+            f"""INSERT INTO templates 
+            (event_type_id, name, recipient, cc, subject, body_hash, note_en, tag_en, sender,
+             updated_at, content_hash) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {_NOW_SQL}, ?)
+            ON CONFLICT (event_type_id, name) DO UPDATE SET
+                recipient = excluded.recipient, cc = excluded.cc, subject = excluded.subject,
+                body_hash = excluded.body_hash, note_en = excluded.note_en, tag_en = excluded.tag_en,
+                sender = excluded.sender, updated_at = excluded.updated_at, content_hash = excluded.content_hash""",
+            [
+                (event_type_id, name) + values[:3] + (body_hash,) + values[4:]
+                + (_content_hash(*values, template.get("variables", [])),)
+                for (event_type_id, name, template), values, body_hash in zip(rows, contents, body_hashes)
+            ]
+        )
+        
+        # 插入後取回ID，重寫變量和全文索引
+        found = self._lookup_templates(cursor, [(event_type_id, name) for event_type_id, name, _ in rows])
+        template_ids = [found[(event_type_id, name)]['id'] for event_type_id, name, _ in rows]
+        positions = [_variable_positions(values[2], values[3], template.get("variables", []))
+                     for (_, _, template), values in zip(rows, contents)]
+        cursor.executemany("DELETE FROM template_variables WHERE template_id = ?",
+                           [(template_id,) for template_id in template_ids])
+        cursor.executemany(
+            "INSERT INTO template_variables (template_id, variable_name, position, location) VALUES (?, ?, ?, ?)",
+            [(template_id, name, position, location)
+             for template_id, variable_positions in zip(template_ids, positions)
+             for name, position, location in variable_positions]
+        )
+        if self.fts_enabled:
+            cursor.executemany("DELETE FROM templates_fts WHERE rowid = ?",
+                               [(template_id,) for template_id in template_ids])
+            cursor.executemany(
+                "INSERT INTO templates_fts (rowid, name, subject, note, tag, body) VALUES (?, ?, ?, ?, ?, ?)",
+                [_search_index_row(template_id, name, values[2], values[4], values[5], values[3])
+                 for template_id, (_, name, _), values in zip(template_ids, rows, contents)]
+            )
+        for template_id, values, variable_positions in zip(template_ids, contents, positions):
+            self._record_revision(cursor, template_id, dict(zip(
+                _REVISION_FIELDS, values + ([variable for variable, _, _ in variable_positions],))),
+                previous.get(template_id))
+        return template_ids
+    
+    def _resolve_event_type_ids(self, cursor, names: Iterable[str], cache: Dict[str, int]):
+        """確保事件類型存在，並把名稱到ID的映射寫入 cache"""
+        for name in names:
+            if name not in cache:
+                cursor.execute("INSERT OR IGNORE INTO event_types (name) VALUES (?)", (name,))
+                cursor.execute("SELECT id FROM event_types WHERE name = ?", (name,))
+                cache[name] = cursor.fetchone()[0]
+    
+    def add_templates_bulk(self, templates: Iterable[Dict], batch_size: int = 500,
+                           progress_callback: Optional[Callable[[int], None]] = None) -> int:
+        """批量插入或更新模板（按事件類型和名稱 upsert），每批一個事務
+        
+        Args:
+            templates (Iterable[Dict]): 模板記錄，每條含 event_type、name 及模板欄位（與 iter_templates 格式相同）
+            batch_size (int): 每批提交的模板數
+            progress_callback (Callable, optional): 每批提交後以已寫入的模板數回調
+        
+        Returns:
+            int: 寫入的模板數
+        """
+        event_type_ids = {}
+        written = 0
+        for batch in _batched(templates, batch_size):
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            try:
+                conn.execute("BEGIN")
+                self._resolve_event_type_ids(cursor, (record["event_type"] for record in batch), event_type_ids)
+                # 同一批內重複的模板以最後一條為準
+                pending = {(event_type_ids[record["event_type"]], record["name"]): record for record in batch}
+                self._upsert_templates(cursor, [key + (record,) for key, record in pending.items()])
+                conn.commit()
+            except (sqlite3.Error, KeyError) as e:
+                conn.rollback()
+                print(f"批量寫入模板失敗: {e}")
+                raise
+            written += len(pending)
+            if progress_callback:
+                progress_callback(written)
+        return written
+    
+    def merge_templates(self, records: Iterable[Dict], chunk_size: int = 500,
+                        progress_callback: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """合併導入模板：新模板插入，已有模板更新，內容未改動的跳過，不刪除現有數據
+        
+        記錄按 chunk_size 分批處理，每批單獨提交，寫鎖不會在整個導入期間一直被佔用。
+        
+        Args:
+            records (Iterable[Dict]): 模板記錄，每條含 event_type、name 及模板欄位（與 iter_templates 格式相同）
+            chunk_size (int): 每批處理並提交的記錄數
+            progress_callback (Callable, optional): 每批提交後以當前計數字典回調
+        
+        Returns:
+            Dict[str, int]: inserted/updated/skipped 計數
+        """
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+        event_type_ids = {}
+        for chunk in _batched(records, chunk_size):
+            self._merge_chunk(chunk, event_type_ids, counts)
+            if progress_callback:
+                progress_callback(dict(counts))
+        return counts
+    
+    def _merge_chunk(self, chunk: List[Dict], event_type_ids: Dict[str, int], counts: Dict[str, int]):
+        """在一個事務中合併一批模板記錄"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            conn.execute("BEGIN")
+            self._resolve_event_type_ids(cursor, (record["event_type"] for record in chunk), event_type_ids)
+            # 同一批內重複的模板以最後一條為準
+            pending = {(event_type_ids[record["event_type"]], record["name"]): record for record in chunk}
+            existing = self._lookup_templates(cursor, list(pending))
+            
+            changed = []
+            inserted = 0
+            for key, record in pending.items():
+                content_hash = _content_hash(*self._template_values(record), record.get("variables", []))
+                row = existing.get(key)
+                if row is not None and row['content_hash'] == content_hash:
+                    counts["skipped"] += 1
+                    continue
+                if row is None:
+                    inserted += 1
+                changed.append(key + (record,))
+            
+            self._upsert_templates(cursor, changed, existing)
+            conn.commit()
+            counts["inserted"] += inserted
+            counts["updated"] += len(changed) - inserted
+        except (sqlite3.Error, KeyError) as e:
+            conn.rollback()
+            print(f"合併導入失敗: {e}")
+            raise
+    
     def get_app_info(self, key, language="en_US"):
         """獲取特定鍵和語言的應用程序信息
         
@@ -685,35 +2219,16 @@ class DatabaseManager:
         Returns:
             str: 應用程序信息值，若找不到則返回鍵本身
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # 先嘗試從多語言表獲取
-        cursor.execute(
-            "SELECT value FROM app_info_translations WHERE key = ? AND language_code = ?", 
-            (key, language)
-        )
-        result = cursor.fetchone()
-        
-        if result:
-            return result[0]
+        metadata = self._get_metadata()
         
-        # 如果找不到指定語言的翻譯，嘗試獲取英文翻譯
-        if language != "en_US":
-            cursor.execute(
-                "SELECT value FROM app_info_translations WHERE key = ? AND language_code = 'en_US'", 
-                (key, )
-            )
-            result = cursor.fetchone()
-            
-            if result:
-                return result[0]
-        
-        # 如果在多語言表中找不到，嘗試從基本表獲取
-        cursor.execute("SELECT value FROM app_info WHERE key = ?", (key,))
-        result = cursor.fetchone()
+        # 先嘗試從多語言表獲取，找不到時使用英文翻譯
+        for language_code in (language, "en_US"):
+            value = metadata["app_info"].get(language_code, {}).get(key)
+            if value is not None:
+                return value
         
-        return result[0] if result else key
+        # 如果在多語言表中找不到，嘗試從舊版基本表獲取
+        return metadata["legacy_app_info"].get(key, key)
         
     def migrate_from_json(self, template_file: str = 'data/templates.json', 
                         settings_file: str = 'data/settings.json',
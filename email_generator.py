@@ -2,11 +2,13 @@ import win32com.client
 import subprocess
 import psutil
 import time
-import re
 import os
 import tkinter.messagebox as msgbox
 from typing import Dict, Any, Optional, List
 from image_manager import ImageManager
+from template_engine import TemplateCache
+from signature_cache import SignatureCache
+from email_renderer import DEFAULT_SIGNATURE, NO_SIGNATURE, render_email
 
 class EmailGenerator:
     """處理 Outlook 電子郵件生成的類"""
@@ -14,6 +16,8 @@ class EmailGenerator:
     def __init__(self):
         """初始化電子郵件生成器"""
         self.image_manager = ImageManager()
+        self.template_cache = TemplateCache()
+        self.signature_cache = SignatureCache()
 
     def is_outlook_running(self) -> bool:
         """檢查 Outlook 是否正在運行"""
@@ -131,90 +135,15 @@ class EmailGenerator:
             namespace = outlook.GetNamespace("MAPI")
             mail = outlook.CreateItem(0)
 
-            # 獲取原始內容
-            body = template.get("body", "")
-            subject = template.get("subject", "")
-            to = template.get("to", "")
-            cc = template.get("cc", "")
-            
-            # 先處理 @{變數Email} 格式，在一般變數替換之前
-            pattern = r'@\{([^{}]+)\}'
-            
-            def email_to_name(match):
-                email_var = match.group(1)
-                if email_var in variables:
-                    email = variables[email_var]
-                    # 從電子郵件中提取名字（取@符號前的部分）
-                    name = email.split('@')[0] if '@' in email else email
-                    # 將名字格式化，例如將"john.doe"轉為"John Doe"
-                    name = name.replace('.', ' ').title()
-                    return f"@{name}"
-                return match.group(0)  # 如果變數不存在，保持原樣
-            
-            # 先應用 @{變數} 處理
-            body = re.sub(pattern, email_to_name, body)
-            
-            # 準備變數字典
-            variables_dict = {}
-            for var_name, var_value in variables.items():
-                variables_dict[var_name] = var_value
-            
-            # 定義完整替換函數 - 確保所有變數都被替換
-            def replace_all_vars(text):
-                if not text:
-                    return ""
-                
-                # 使用正則表達式替換所有 {變數名} 格式的文本
-                def replace_var(match):
-                    var_full = match.group(0)  # 完整的 {變數名}
-                    var_name = match.group(1)  # 提取變數名
-                    
-                    # 檢查是否為圖片變數
-                    if var_name.startswith('inserted_photo') or var_name.startswith('inserted photo'):
-                        # 如果是圖片變數但在主題或普通文本中，直接返回空字符串或描述性文本
-                        return "[圖片]"
-                        
-                    # 非圖片變數，嘗試從變數字典中獲取值
-                    if var_name in variables_dict:
-                        return variables_dict[var_name]
-                    return var_full  # 如果找不到對應的值，保持原樣
-                    
-                # 使用正則替換
-                pattern = r'\{([^{}]+)\}'
-                return re.sub(pattern, replace_var, text)
-            
-            # 對主題和收件人信息進行完整變數替換
-            subject = replace_all_vars(subject)
-            to = replace_all_vars(to)
-            cc = replace_all_vars(cc)
-            
-            # 處理內文中的變數替換 - 圖片變數在主窗口中已經處理
-            # 但一般文本變數需要在這裡處理
-            if "<html>" in body.lower():
-                # HTML 內容需要特殊處理，保留圖片變數的處理結果
-                pattern = r'\{([^{}]+)\}'
-                
-                def replace_body_var(match):
-                    var_name = match.group(1)
-                    
-                    # 檢查是否為圖片變數 - 保留原樣，因為可能已經被處理
-                    if var_name.startswith('inserted_photo') or var_name.startswith('inserted photo'):
-                        return match.group(0)
-                    
-                    # 非圖片變數
-                    if var_name in variables_dict:
-                        return variables_dict[var_name]
-                    return match.group(0)
-                
-                # 替換內文中的變數
-                body = re.sub(pattern, replace_body_var, body)
-            else:
-                # 純文本內容，直接替換所有變數
-                body = replace_all_vars(body)
+            # 渲染與 Outlook 無關，這裡只把結果寫入郵件
+            rendered = render_email(template, variables, signature_option,
+                                    image_manager=self.image_manager, template_cache=self.template_cache,
+                                    signature_cache=self.signature_cache)
+            subject = rendered.subject
             
             # 設置郵件屬性 - 確保主題被完全設置
-            mail.To = to
-            mail.CC = cc
+            mail.To = rendered.to
+            mail.CC = rendered.cc
             
             # 特別處理主題行 - 確保完整顯示
             try:
@@ -228,63 +157,20 @@ class EmailGenerator:
                 # 如果高級方法失敗，回退到基本方法
                 mail.Subject = subject
             
-            # 處理簽名檔設置
-            use_signature = True
-            if signature_option == "<None>":
-                use_signature = False
-            elif signature_option != "<Default>" and isinstance(signature_option, str):
-                # 嘗試使用指定的簽名檔
-                try:
-                    import os
-                    appdata = os.environ.get('APPDATA', '')
-                    signature_path = os.path.join(appdata, 'Microsoft', 'Signatures', signature_option)
-                    
-                    # 優先嘗試 HTML 格式
-                    html_path = f"{signature_path}.htm"
-                    if os.path.exists(html_path):
-                        with open(html_path, 'r', encoding='utf-8') as f:
-                            signature_html = f.read()
-                        # 找到簽名檔的 <body> 部分
-                        body_match = re.search(r'<body[^>]*>(.*?)</body>', signature_html, re.DOTALL)
-                        if body_match:
-                            signature_content = body_match.group(1)
-                            # 在郵件 HTML 結尾前添加簽名檔
-                            if "<html>" in body.lower():
-                                body = body.replace('</body>', signature_content + '</body>')
-                            else:
-                                body = f"<html><body>{body}{signature_content}</body></html>"
-                    
-                    # 設置 use_signature = False 避免自動添加默認簽名檔
-                    use_signature = False
-                except Exception as e:
-                    print(f"使用指定簽名檔時出錯: {e}")
-            
             # 設置郵件正文
-            if "<html>" in body.lower():
-                mail.HTMLBody = body
-                if not use_signature:
-                    try:
-                        mail._oleobj_.Invoke(*(2381, 0, 8, 0, False))  # Don't use signature
-                    except:
-                        print("禁用簽名檔失敗")
-            elif any(tag in body.lower() for tag in ["<p>", "<div>", "<span>", "<table>", "<br", "<img"]):
-                mail.HTMLBody = f"<html><body>{body}</body></html>"
-                if not use_signature:
-                    try:
-                        mail._oleobj_.Invoke(*(2381, 0, 8, 0, False))  # Don't use signature
-                    except:
-                        print("禁用簽名檔失敗")
+            if rendered.is_html:
+                mail.HTMLBody = rendered.html_body
             else:
-                mail.Body = body
-                if not use_signature:
-                    try:
-                        mail._oleobj_.Invoke(*(2381, 0, 8, 0, False))  # Don't use signature
-                    except:
-                        print("禁用簽名檔失敗")
+                mail.Body = rendered.text_body
+            if not rendered.use_default_signature:
+                try:
+                    mail._oleobj_.Invoke(*(2381, 0, 8, 0, False))  # Don't use signature
+                except:
+                    print("禁用簽名檔失敗")
 
-            # 檢查是否有圖片附件需要添加
-            if "cid:" in body:
-                self._add_image_attachments(mail, template.get("name", ""))
+            # 添加正文中以 cid: 引用的圖片附件
+            if rendered.attachments:
+                self._add_image_attachments(mail, rendered.attachments)
 
             # 設置寄件人（如果指定）
             sender_success = False
@@ -372,27 +258,15 @@ class EmailGenerator:
             return False
 
     def get_outlook_signatures(self) -> List[str]:
-        """獲取 Outlook 中可用的簽名檔列表"""
-        signatures = ["<Default>", "<None>"]  # 基本選項
+        """獲取 Outlook 中可用的簽名檔列表（簽名檔目錄未變化時使用緩存的列表）"""
+        signatures = [DEFAULT_SIGNATURE, NO_SIGNATURE]  # 基本選項
         
-        # 嘗試查找簽名檔路徑
         try:
-            import os
-            import platform
-            
-            if platform.system() == 'Windows':
-                # Windows 上 Outlook 簽名檔的默認位置
-                appdata = os.environ.get('APPDATA', '')
-                signature_path = os.path.join(appdata, 'Microsoft', 'Signatures')
-                
-                if os.path.exists(signature_path):
-                    # 獲取所有 HTML 和 RTF 簽名檔
-                    for file in os.listdir(signature_path):
-                        base, ext = os.path.splitext(file)
-                        if ext.lower() in ['.htm', '.html', '.rtf']:
-                            if base not in signatures:
-                                signatures.append(base)
-        except Exception as e:
+            # 獲取所有 HTML 和 RTF 簽名檔
+            for name in self.signature_cache.names():
+                if name not in signatures:
+                    signatures.append(name)
+        except OSError as e:
             print(f"獲取簽名檔時出錯: {e}")
         
         return signatures
@@ -410,16 +284,13 @@ class EmailGenerator:
         mail.SentOnBehalfOfName = email_address
         return True
 
-    def _add_image_attachments(self, mail, template_name):
+    def _add_image_attachments(self, mail, image_paths):
         """添加圖片附件到郵件並設置內容ID
         
         Args:
             mail: Outlook郵件對象
-            template_name (str): 模板名稱
+            image_paths (Iterable[str]): 圖片路徑，由 render_email 找出
         """
-        # 獲取模板的所有圖片
-        image_paths = self.image_manager.get_image_paths(template_name)
-        
         # 添加圖片作為附件
         for image_path in image_paths:
             filename = os.path.basename(image_path)
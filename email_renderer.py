@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from image_manager import ImageManager
+from signature_cache import SignatureCache
+from template_engine import TemplateCache
+
+
+# 簽名檔選項：使用 Outlook 默認簽名檔 / 不使用簽名檔，其他值為簽名檔名稱
+DEFAULT_SIGNATURE = "<Default>"
+NO_SIGNATURE = "<None>"
+
+# 正文不含 <html> 但含這些標籤時按 HTML 發送
+_HTML_FRAGMENT_TAGS = ("<p>", "<div>", "<span>", "<table>", "<br", "<img")
+
+# 默認的編譯模板緩存和簽名檔緩存，多次渲染時共用
+_template_cache = TemplateCache()
+_signature_cache = SignatureCache()
+
+
+@dataclass(frozen=True)
+class RenderedEmail:
+    """渲染完成的郵件內容，不依賴 Outlook，可直接檢查、比較或批量處理
+
+    html_body 與 text_body 只有一個有值。
+    """
+    subject: str
+    to: str
+    cc: str
+    html_body: Optional[str]
+    text_body: Optional[str]
+    attachments: Tuple[str, ...] = ()
+    # 是否由 Outlook 自動添加默認簽名檔；不使用簽名檔或已合併指定簽名檔時為 False
+    use_default_signature: bool = True
+
+    @property
+    def is_html(self) -> bool:
+        return self.html_body is not None
+
+    @property
+    def body(self) -> str:
+        return self.html_body if self.html_body is not None else self.text_body
+
+
+def load_signature_fragment(signature_name: str) -> Optional[str]:
+    """讀取 HTML 簽名檔 <body> 中的內容，經模塊共用的簽名檔緩存，文件未修改時不重新讀取
+
+    Args:
+        signature_name (str): 簽名檔名稱（不含擴展名）
+
+    Returns:
+        Optional[str]: 簽名檔片段，其中的簽名檔圖片已改為 cid 引用；文件不存在或沒有 <body> 時返回 None
+    """
+    entry = _signature_cache.get(signature_name)
+    return entry.fragment if entry else None
+
+
+def render_email(template: Dict, variables: Dict[str, str], signature: Optional[str] = DEFAULT_SIGNATURE,
+                 image_manager: Optional[ImageManager] = None,
+                 template_cache: Optional[TemplateCache] = None,
+                 signature_cache: Optional[SignatureCache] = None) -> RenderedEmail:
+    """渲染郵件：替換變數、合併簽名檔、決定 HTML 或純文本正文並找出需要附加的圖片
+
+    Args:
+        template (Dict): 模板，含 subject、to、cc、body，可選 id、content_hash 和 name
+        variables (Dict[str, str]): 變數名到值的映射
+        signature (str, optional): DEFAULT_SIGNATURE、NO_SIGNATURE 或簽名檔名稱
+        image_manager (ImageManager, optional): 查找模板圖片，默認新建
+        template_cache (TemplateCache, optional): 編譯模板緩存，默認使用模塊共用的緩存
+        signature_cache (SignatureCache, optional): 簽名檔緩存，默認使用模塊共用的緩存
+
+    Returns:
+        RenderedEmail: 渲染結果
+    """
+    rendered = (template_cache or _template_cache).render(template, variables)
+    body = rendered["body"]
+    # 模板圖片以 cid:文件名 引用，需在合併簽名檔之前判斷
+    uses_template_images = "cid:" in body
+
+    use_default_signature = signature in (None, DEFAULT_SIGNATURE)
+    signature_content = None
+    signature_images = ()
+    if signature not in (None, DEFAULT_SIGNATURE, NO_SIGNATURE):
+        try:
+            entry = (signature_cache or _signature_cache).get(signature)
+        except OSError as e:
+            print(f"使用指定簽名檔時出錯: {e}")
+            entry = None
+        if entry is not None and entry.fragment is not None:
+            signature_content, signature_images = entry.fragment, entry.images
+        if signature_content is not None:
+            # 在郵件 HTML 結尾前添加簽名檔
+            if "<html>" in body.lower():
+                body = body.replace('</body>', signature_content + '</body>')
+            else:
+                body = f"<html><body>{body}{signature_content}</body></html>"
+
+    lower_body = body.lower()
+    if "<html>" in lower_body:
+        html_body, text_body = body, None
+    elif any(tag in lower_body for tag in _HTML_FRAGMENT_TAGS):
+        html_body, text_body = f"<html><body>{body}</body></html>", None
+    else:
+        html_body, text_body = None, body
+
+    attachments = ()
+    if uses_template_images:
+        attachments = tuple((image_manager or ImageManager()).get_image_paths(template.get("name", "")))
+    # 簽名檔圖片在片段中已改為 cid 引用，與模板圖片一起附加
+    attachments += signature_images
+
+    return RenderedEmail(
+        subject=rendered["subject"],
+        to=rendered["to"],
+        cc=rendered["cc"],
+        html_body=html_body,
+        text_body=text_body,
+        attachments=attachments,
+        use_default_signature=use_default_signature,
+    )
@@ -101,7 +101,7 @@ class EditTemplateWindow:
             # 自动提取变量
             pattern = r'\{([^{}]+)\}'
             body_vars = re.findall(pattern, content)
-            body_vars = sorted(list(set(body_vars)))  # 去重 & 排序
+            body_vars = list(dict.fromkeys(body_vars))  # 去重，保持首次出現的順序
             self.variables_entry.delete(0, tk.END)
             self.variables_entry.insert(0, ", ".join(body_vars))
 
@@ -560,6 +560,19 @@ class EditTemplateWindow:
             messagebox.showwarning("Warning", self._("enter_content"))
             return
 
+        # 如果是编辑模板，并且修改了模板名称，先重命名原模板（保留ID，图片目录同步改名）
+        if not self.is_new and name != self.original_name:
+            existing_templates = self.template_manager.get_template_names_for_event(self.event_type)
+            overwrite = name in existing_templates
+            if overwrite:
+                if not messagebox.askyesno("Confirm", self._("template_name_exists").format(name=name)):
+                    return
+            
+            if not self.template_manager.rename_template(self.event_type, self.original_name, name, overwrite):
+                messagebox.showerror("Error", f"Failed to rename template '{self.original_name}'")
+                return
+            self.original_name = name
+
         # 处理HTML内容中的图片
         try:
             from image_manager import ImageManager
@@ -586,21 +599,6 @@ class EditTemplateWindow:
             "use_signature": self.use_signature_var.get() if hasattr(self, 'use_signature_var') else True
         }
 
-        # 如果是编辑模板，并且修改了模板名称，则检查是否存在同名模板
-        if not self.is_new and name != self.original_name:
-            existing_templates = self.template_manager.get_template_names_for_event(self.event_type)
-            if name in existing_templates:
-                if not messagebox.askyesno("Confirm", self._("template_name_exists").format(name=name)):
-                    return
-                
-                # 重命名模板时，处理图片目录
-                try:
-                    image_manager.rename_template_image_dir(self.original_name, name)
-                except Exception as e:
-                    print(f"重命名图片目录时出错: {e}")
-                
-                self.template_manager.remove_template(self.event_type, self.original_name)
-
         # 保存模板
         self.template_manager.add_template(self.event_type, template_data)
 
@@ -12,11 +12,16 @@ import sqlite3
 import importlib.util
 from tkinter import ttk
 from email_generator import EmailGenerator
+from change_watcher import ChangeWatcher
+from db_maintenance import DatabaseMaintenance
 from gui.edit_template import EditTemplateWindow
 
 
 db_queue = queue.Queue()
 
+# 搜索結果列表一次最多顯示的模板數量
+SEARCH_PAGE_SIZE = 500
+
 
 class DBWorker(threading.Thread):
     def __init__(self, db_queue):
@@ -61,6 +66,7 @@ class MainWindow:
         # 初始化其他設置
         self.search_timer = None
         self.cached_template_content = {}
+        self.previewed_template = None
         
         # 確保 db_worker 線程只啟動一次
         if not hasattr(self, 'db_worker') or not self.db_worker.is_alive():
@@ -100,6 +106,17 @@ class MainWindow:
         self.root.update_idletasks()
         self._center_window()
         self.root.deiconify()
+        
+        # 多個實例共用數據庫時，定時檢測其他實例的修改並只刷新受影響的部分
+        db_manager = self.template_manager.db_manager
+        self.change_watcher = ChangeWatcher(
+            db_manager, interval_ms=int(db_manager.get_setting('change_poll_ms', '2000'))
+        )
+        self.change_watcher.start(self.root, self._on_external_change)
+        
+        # 空閒時分步回收刪除模板後的空閒頁並更新查詢統計
+        self.maintenance = DatabaseMaintenance(db_manager)
+        self.maintenance.start(self.root)
 
     def _center_window(self):
         """將窗口置於螢幕中央"""
@@ -150,10 +167,6 @@ class MainWindow:
         title_label.pack(pady=10)
         title_label.language_key = "app_title" 
 
-        conn = sqlite3.connect('data/app.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM app_info WHERE key = 'version'")
-
         # 在標題標籤後添加版本和關於按鈕
         header_frame = ttk.Frame(main_frame)
         
@@ -333,7 +346,10 @@ class MainWindow:
             textvariable=self.signature_var,
             values=signatures,
             width=15,
-            state="readonly"
+            state="readonly",
+            # 展開時刷新列表；簽名檔目錄未變化時直接使用緩存，不重新列出目錄
+            postcommand=lambda: self.signature_combobox.configure(
+                values=self.email_generator.get_outlook_signatures())
         )
         self.signature_combobox.pack(side=tk.LEFT, padx=2)
 
@@ -371,6 +387,10 @@ class MainWindow:
         #file_menu.add_command(label=self._("export_templates"), command=self._export_templates)
         file_menu.add_separator()
         file_menu.add_command(label=self._("backup_now"), command=self._backup_database)
+        file_menu.add_command(
+            label=self._("mail_merge") if self._("mail_merge") != "mail_merge" else "Mail Merge from CSV...",
+            command=self._mail_merge
+        )
         file_menu.add_separator()
         file_menu.add_command(label=self._("exit"), command=self.root.quit)
 
@@ -405,67 +425,27 @@ class MainWindow:
 
     def _perform_search(self, search_text, event_type):
         """执行搜索操作"""
-        # 查询模板并更新模板列表
-        results = self.template_manager.search_templates(search_text)
-        filtered_templates = [template for template in results if template["event_type"] == event_type]
+        # 清除上一次搜索留下的結果總數
+        self.status_var.set("")
+        # 在數據庫中按事件類型過濾，只取列表需要的名稱
+        results = self.template_manager.search_templates_page(
+            search_text, event_type=event_type, columns=["name"], limit=SEARCH_PAGE_SIZE
+        )
         
         # 清空模板列表并重新插入
         self.template_listbox.delete(0, tk.END)
-        for template in filtered_templates:
-            self.template_listbox.insert(tk.END, template["template"]["name"])
-
-    def search_templates(self, keyword: str) -> List[Dict]:
-        """搜索包含关键字的模板"""
-        conn = self.get_connection()  # Each thread uses its own connection
-        cursor = conn.cursor()
-
-        keyword = f"%{keyword}%"  # Use LIKE for fuzzy matching
-
-        cursor.execute(
-            """SELECT t.id, t.name, t.recipient, t.cc, t.subject, t.body, t.note_en, t.tag_en, et.name as event_type
-            FROM templates t
-            JOIN event_types et ON t.event_type_id = et.id
-            WHERE t.name LIKE ? OR t.subject LIKE ? OR t.body LIKE ?""",
-            (keyword, keyword, keyword)
-        )
-
-        results = []
-        for template in cursor.fetchall():
-            template_dict = dict(template)
-
-            # Modify key names to match expected output
-            if 'recipient' in template_dict:
-                template_dict['to'] = template_dict['recipient']
-                del template_dict['recipient']
-
-            # Get variables
-            cursor.execute(
-                "SELECT variable_name FROM template_variables WHERE template_id = ?",
-                (template_dict['id'],)
-            )
-
-            template_dict['variables'] = [row[0] for row in cursor.fetchall()]
-            results.append({
-                "event_type": template_dict['event_type'],
-                "template": {
-                    "name": template_dict['name'],
-                    "to": template_dict['to'],
-                    "cc": template_dict['cc'],
-                    "subject": template_dict['subject'],
-                    "body": template_dict['body'],
-                    "variables": template_dict['variables'],
-                    "note_en": template_dict['note_en'],
-                    "tag_en": template_dict['tag_en'],
-                }
-            })
-            
-
-        conn.close()  # Ensure the connection is closed
-        return results
+        for template in results:
+            self.template_listbox.insert(tk.END, template["name"])
+        
+        # 結果超過一頁時在狀態欄提示總數
+        if len(results) >= SEARCH_PAGE_SIZE:
+            total = self.template_manager.count_search_results(search_text, event_type)
+            self.status_var.set(f"{len(results)} / {total}")
 
     def _clear_search(self):
         """清空搜索框"""
         self.search_var.set("")
+        self.status_var.set("")
         # 當清空搜索框時，重新加載當前事件類型的所有模板
         event_type = self.selected_event_type.get()
         if event_type:
@@ -483,8 +463,8 @@ class MainWindow:
         # 清空模板列表
         self.template_listbox.delete(0, tk.END)
         
-        # 獲取該事件類型的所有模板
-        templates = self.template_manager.get_templates_for_event(event_type)
+        # 只獲取列表需要的模板摘要，不讀取正文
+        templates = self.template_manager.get_template_summaries(event_type)
         for template in templates:
             self.template_listbox.insert(tk.END, template["name"])
     
@@ -502,6 +482,7 @@ class MainWindow:
         template = self.template_manager.get_template(event_type, template_name)
         if not template:
             return
+        self.previewed_template = template
 
         # 清空变量输入框
         self._clear_variable_entries()
@@ -755,7 +736,7 @@ class MainWindow:
                 text_widget.insert(tk.END, part)
         
     def _create_variable_entries(self, template):
-        """創建變量輸入框，根據郵件內容中出現的順序 (包括同一行多變數)"""
+        """創建變量輸入框，按變量在主題和正文中首次出現的順序 (保存模板時已記錄，無需再掃描正文)"""
         # 清空變量框
         self._clear_variable_entries()
         
@@ -763,34 +744,9 @@ class MainWindow:
             ttk.Label(self.var_scrollable_frame, text=self._("no_variables") if hasattr(self, '_') and callable(self._) else "No variables").pack(pady=10)
             return
         
-        variables = template.get("variables", [])
-        subject = template.get("subject", "")
-        body = template.get("body", "")
-        
-        ordered_variables = []
-        seen = set()
-        
-        # Helper function: extract in-order unique vars
-        def extract_vars(text):
-            matches = re.findall(r'\{([^{}]+)\}', text)
-            for var in matches:
-                if var in variables and var not in seen:
-                    ordered_variables.append(var)
-                    seen.add(var)
+        ordered_variables = template.get("variables", [])
         
-        # 1. 先處理主題行
-        extract_vars(subject)
-        
-        # 2. 再處理正文
-        extract_vars(body)
-        
-        # 3. 剩餘沒出現的
-        for var in variables:
-            if var not in seen:
-                ordered_variables.append(var)
-                seen.add(var)
-        
-        # 4. 建立變量輸入框
+        # 建立變量輸入框
         for var_name in ordered_variables:
             var_frame = ttk.Frame(self.var_scrollable_frame)
             var_frame.pack(fill=tk.X, padx=5, pady=2)
@@ -929,7 +885,8 @@ class MainWindow:
             
             # 檢查目標事件類型中是否已存在同名模板
             existing_templates = self.template_manager.get_template_names_for_event(target)
-            if template_name in existing_templates:
+            overwrite = template_name in existing_templates
+            if overwrite:
                 # 詢問是否覆蓋
                 if not messagebox.askyesno(
                     self._("confirm"),
@@ -940,10 +897,11 @@ class MainWindow:
             
             # 執行移動操作
             try:
-                # 在目標事件類型中添加模板
-                self.template_manager.add_template(target, template)
-                # 從原事件類型中刪除模板
-                self.template_manager.remove_template(current_event_type, template_name)
+                # 只更新模板所屬的事件類型，覆蓋同名模板在同一事務中完成
+                if not self.template_manager.move_template_to_event_type(
+                    current_event_type, target, template_name, overwrite=overwrite
+                ):
+                    raise RuntimeError(template_name)
                 
                 # 顯示成功消息
                 messagebox.showinfo(
@@ -992,18 +950,9 @@ class MainWindow:
         
         # 執行重命名操作
         try:
-            # 獲取所有該事件類型的模板
-            templates = self.template_manager.get_templates_for_event(event_type)
-            
-            # 創建新事件類型
-            self.template_manager.add_event_type(new_name)
-            
-            # 將所有模板移動到新事件類型
-            for template in templates:
-                self.template_manager.add_template(new_name, template)
-            
-            # 刪除舊事件類型（會自動刪除關聯的模板）
-            self.template_manager.remove_event_type(event_type)
+            # 只更新事件類型名稱，模板保持不變
+            if not self.template_manager.rename_event_type(event_type, new_name):
+                raise RuntimeError(new_name)
             
             # 刷新事件類型下拉菜單
             self._update_event_types()
@@ -1344,6 +1293,42 @@ class MainWindow:
                     self._on_template_selected(None)
                     break
     
+    def _on_external_change(self, changed_event_types, event_types_changed):
+        """其他實例修改數據庫後的回調，只刷新受影響的事件類型列表和預覽"""
+        event_type = self.selected_event_type.get()
+        
+        if event_types_changed:
+            event_types = self.template_manager.get_event_types()
+            self.event_type_combobox['values'] = event_types
+            if event_type not in event_types:
+                # 當前事件類型已被改名或刪除
+                self._update_event_types()
+                return
+        
+        if event_type not in changed_event_types:
+            return
+        
+        # 保留搜索結果和當前選擇
+        current_template = self.selected_template.get()
+        search_text = self.search_var.get().lower().strip()
+        if search_text:
+            self._perform_search(search_text, event_type)
+        else:
+            self._load_templates_for_event_type(event_type)
+        
+        names = self.template_listbox.get(0, tk.END)
+        if current_template in names:
+            self.template_listbox.selection_set(names.index(current_template))
+            # 只有當前模板內容變化時才重建預覽，避免清空正在輸入的變量
+            template = self.template_manager.get_template(event_type, current_template)
+            if template != self.previewed_template:
+                self._on_template_selected(None)
+        elif current_template:
+            removed_text = (self._("template_removed_elsewhere")
+                            if self._("template_removed_elsewhere") != "template_removed_elsewhere"
+                            else "Template '{name}' was renamed or deleted by another instance")
+            self.status_var.set(removed_text.format(name=current_template))
+    
     def _generate_email(self):
         """生成 Outlook 郵件"""
         # 檢查是否選擇了模板
@@ -1444,14 +1429,97 @@ class MainWindow:
                     self._("export_error").format(error=str(e))
                 )
     
+    def _mail_merge(self):
+        """按 CSV 文件的每一行用當前模板批量生成郵件"""
+        from tkinter import filedialog
+        from mail_merge import MailMerge, EmlWriter, OutlookDraftWriter, read_rows
+        
+        def text(key, default):
+            return self._(key) if self._(key) != key else default
+        
+        event_type = self.selected_event_type.get()
+        template_name = self.selected_template.get()
+        template = self.template_manager.get_template(event_type, template_name) if template_name else None
+        if not template:
+            messagebox.showwarning(self._("warning"), self._("please_select_template"))
+            return
+        
+        csv_path = filedialog.askopenfilename(
+            title=text("mail_merge", "Mail Merge from CSV..."),
+            filetypes=[("CSV", "*.csv"), (self._("all_files"), "*.*")]
+        )
+        if not csv_path:
+            return
+        
+        # 是：保存到 Outlook 草稿箱；否：導出 .eml 文件
+        to_drafts = messagebox.askyesnocancel(
+            text("mail_merge", "Mail Merge from CSV..."),
+            text("mail_merge_output", "Save the emails as Outlook drafts?\n\nChoose No to export .eml files instead.")
+        )
+        if to_drafts is None:
+            return
+        if to_drafts:
+            if not self.email_generator.start_outlook_if_needed(self.language_manager):
+                return
+            writer = OutlookDraftWriter(template.get("sender") or None)
+        else:
+            output_dir = filedialog.askdirectory(title=text("mail_merge", "Mail Merge from CSV..."))
+            if not output_dir:
+                return
+            writer = EmlWriter(output_dir)
+        
+        merge = MailMerge(template, signature=self.signature_var.get())
+        
+        # 進度窗口，可取消
+        dialog = tk.Toplevel(self.root)
+        dialog.title(text("mail_merge", "Mail Merge from CSV..."))
+        dialog.transient(self.root)
+        progress_var = StringVar(value=text("mail_merge_progress", "Generated {done}, failed {failed}").format(done=0, failed=0))
+        ttk.Label(dialog, textvariable=progress_var, width=50).pack(padx=20, pady=(20, 10))
+        cancel_btn = ttk.Button(dialog, text=self._("cancel"), command=merge.cancel)
+        cancel_btn.pack(pady=(0, 20))
+        dialog.protocol("WM_DELETE_WINDOW", merge.cancel)
+        
+        def on_progress(done, failed):
+            self.root.after(0, lambda: progress_var.set(
+                text("mail_merge_progress", "Generated {done}, failed {failed}").format(done=done, failed=failed)))
+        
+        def run():
+            try:
+                result = merge.run(read_rows(csv_path), writer, on_progress)
+            except Exception as e:
+                # CSV 無法讀取等整體錯誤
+                result = {"written": 0, "errors": [(0, f"{type(e).__name__}: {e}")], "cancelled": False,
+                          "elapsed": 0.0, "mails_per_second": 0.0}
+            self.root.after(0, lambda: self._on_mail_merge_done(dialog, result))
+        
+        threading.Thread(target=run, name="mail-merge", daemon=True).start()
+    
+    def _on_mail_merge_done(self, dialog, result):
+        """郵件合併完成後在主線程中顯示結果"""
+        dialog.destroy()
+        summary = (self._("mail_merge_done") if self._("mail_merge_done") != "mail_merge_done"
+                   else "Generated {written} emails ({rate:.0f}/s), {failed} row(s) failed.")
+        summary = summary.format(written=result["written"], rate=result["mails_per_second"],
+                                 failed=len(result["errors"]))
+        self.status_var.set(summary)
+        
+        # 最多列出前 20 個失敗的行
+        details = [f"#{row_number}: {error}" for row_number, error in result["errors"][:20]]
+        if len(result["errors"]) > 20:
+            details.append("...")
+        message = "\n".join([summary] + details)
+        if result["errors"]:
+            messagebox.showwarning(self._("warning"), message)
+        else:
+            messagebox.showinfo(self._("success"), message)
+    
     def _backup_database(self):
-        """备份数据库文件"""
+        """在後台線程中備份数据库文件，進度顯示在狀態欄"""
         from tkinter import filedialog
-        import shutil
-        import time
+        from backup_service import BackupService
         
-        # 获取数据库文件路径
-        db_file = self.template_manager.db_manager.db_file
+        db_manager = self.template_manager.db_manager
         
         # 打开文件对话框选择保存位置
         backup_dir = filedialog.askdirectory(
@@ -1459,22 +1527,54 @@ class MainWindow:
         )
         
         if backup_dir:
-            # 生成备份文件名，包含时间戳
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            backup_file = os.path.join(backup_dir, f"app_backup_{timestamp}.db")
-            
-            try:
-                # 复制数据库文件
-                shutil.copy2(db_file, backup_file)
-                messagebox.showinfo(
-                    self._("success"), 
-                    f"{self._('backup_success')}\n{backup_file}"
-                )
-            except Exception as e:
-                messagebox.showerror(
-                    self._("error"), 
-                    f"{self._('export_error').format(error=str(e))}"
-                )
+            # 手動備份不清理舊文件（保留數量只用於自動備份目錄），壓縮選項來自設置
+            service = BackupService(
+                db_manager.db_file,
+                keep=0,
+                compress=db_manager.get_setting('backup_compress', '0') == '1'
+            )
+            self.start_backup(service, backup_dir, notify=True)
+    
+    def start_backup(self, service, backup_dir=None, notify=False):
+        """啟動後台備份並在狀態欄顯示進度
+        
+        Args:
+            service (BackupService): 備份服務
+            backup_dir (str, optional): 備份目錄，默認使用服務的備份目錄
+            notify (bool): 完成後是否彈窗提示，否則只更新狀態欄
+        """
+        progress_text = (self._("backup_progress") if self._("backup_progress") != "backup_progress"
+                         else "Backing up database... {percent}%")
+        
+        def on_progress(copied, total):
+            percent = int(copied * 100 / total) if total else 100
+            self.root.after(0, lambda: self.status_var.set(progress_text.format(percent=percent)))
+        
+        def on_done(backup_file, error):
+            self.root.after(0, lambda: self._on_backup_done(backup_file, error, notify))
+        
+        service.backup_async(backup_dir, progress_callback=on_progress, done_callback=on_done)
+    
+    def _on_backup_done(self, backup_file, error, notify):
+        """備份完成後在主線程中更新界面"""
+        if error is not None:
+            failed_text = (self._("backup_failed") if self._("backup_failed") != "backup_failed"
+                           else "Backup failed: {error}")
+            self.status_var.set(failed_text.format(error=str(error)))
+            if notify:
+                messagebox.showerror(self._("error"), failed_text.format(error=str(error)))
+            return
+        
+        if notify:
+            self.status_var.set(self._("backup_success"))
+            messagebox.showinfo(
+                self._("success"), 
+                f"{self._('backup_success')}\n{backup_file}"
+            )
+        else:
+            done_text = (self._("auto_backup_done") if self._("auto_backup_done") != "auto_backup_done"
+                         else "Database backed up automatically: {path}")
+            self.status_var.set(done_text.format(path=backup_file))
     
     def _change_language(self):
         """即時更改應用程序語言無需重啟"""
@@ -5,6 +5,9 @@ import base64
 import shutil
 from pathlib import Path
 
+# 重命名模板時被替換的圖片目錄的後綴；目錄名只含 \w 和 -，不會與模板目錄衝突
+REPLACED_SUFFIX = '.replaced'
+
 class ImageManager:
     """管理電子郵件模板中的圖片"""
     
@@ -64,8 +67,8 @@ class ImageManager:
         
         return html_content
     
-    def _get_template_image_dir(self, template_name):
-        """獲取模板的圖片目錄，確保存在
+    def _template_image_path(self, template_name):
+        """模板圖片目錄的路徑，不創建目錄
         
         Args:
             template_name (str): 模板名稱
@@ -75,7 +78,18 @@ class ImageManager:
         """
         # 生成目錄安全的名稱
         safe_name = re.sub(r'[^\w\-_]', '_', template_name)
-        template_dir = os.path.join(self.image_dir, safe_name)
+        return os.path.join(self.image_dir, safe_name)
+    
+    def _get_template_image_dir(self, template_name):
+        """獲取模板的圖片目錄，確保存在
+        
+        Args:
+            template_name (str): 模板名稱
+            
+        Returns:
+            str: 模板圖片目錄路徑
+        """
+        template_dir = self._template_image_path(template_name)
         
         # 確保目錄存在
         os.makedirs(template_dir, exist_ok=True)
@@ -127,6 +141,9 @@ class ImageManager:
     def rename_template_image_dir(self, old_name, new_name):
         """當模板重命名時更新圖片目錄
         
+        新名稱已有的圖片目錄不直接刪除，先改名為 "<目錄>.replaced"：數據庫提交成功後由
+        discard_replaced_image_dir 刪除，提交失敗時由 undo_rename_template_image_dir 恢復。
+        
         Args:
             old_name (str): 舊模板名稱
             new_name (str): 新模板名稱
@@ -141,13 +158,44 @@ class ImageManager:
             return True  # 舊目錄不存在，視為成功
             
         try:
-            # 如果新目錄已存在，先清空
-            if os.path.exists(new_dir) and old_dir != new_dir:
-                shutil.rmtree(new_dir)
-            # 重命名目錄
             if old_dir != new_dir:
+                # 新目錄已存在時先移到一旁
+                if os.path.exists(new_dir):
+                    replaced_dir = new_dir + REPLACED_SUFFIX
+                    if os.path.exists(replaced_dir):
+                        shutil.rmtree(replaced_dir)
+                    os.rename(new_dir, replaced_dir)
+                # 重命名目錄
                 shutil.move(old_dir, new_dir)
             return True
         except Exception as e:
             print(f"重命名圖片目錄時出錯: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def undo_rename_template_image_dir(self, old_name, new_name):
+        """撤銷 rename_template_image_dir：目錄改回舊名稱，並恢復被替換的目錄
+        
+        Args:
+            old_name (str): 舊模板名稱
+            new_name (str): 新模板名稱
+        """
+        old_dir = self._template_image_path(old_name)
+        new_dir = self._template_image_path(new_name)
+        if old_dir == new_dir:
+            return
+        replaced_dir = new_dir + REPLACED_SUFFIX
+        try:
+            if os.path.exists(new_dir) and not os.path.exists(old_dir):
+                shutil.move(new_dir, old_dir)
+            if os.path.exists(replaced_dir) and not os.path.exists(new_dir):
+                os.rename(replaced_dir, new_dir)
+        except OSError as e:
+            print(f"恢復圖片目錄時出錯: {e}")
+    
+    def discard_replaced_image_dir(self, template_name):
+        """重命名提交後刪除被替換的圖片目錄
+        
+        Args:
+            template_name (str): 新模板名稱
+        """
+        shutil.rmtree(self._template_image_path(template_name) + REPLACED_SUFFIX, ignore_errors=True)
@@ -145,6 +145,14 @@ class LanguageManager:
                 'backup_export': '導出爲JSON',
                 'backup_success': '備份成功',
                 'backup_folder': '備份文件夾',
+                'backup_progress': '正在備份數據庫... {percent}%',
+                'backup_failed': '備份失敗: {error}',
+                'auto_backup_done': '已自動備份數據庫: {path}',
+                'template_removed_elsewhere': "模板 '{name}' 已被其他實例改名或刪除",
+                'mail_merge': '從 CSV 批量生成郵件...',
+                'mail_merge_output': '將郵件保存到 Outlook 草稿箱？\n\n選擇「否」則導出為 .eml 文件。',
+                'mail_merge_progress': '已生成 {done} 封，失敗 {failed} 行',
+                'mail_merge_done': '已生成 {written} 封郵件（{rate:.0f} 封/秒），{failed} 行失敗。',
                 
                 # HTML编辑器
                 'font': '字型',
@@ -306,6 +314,14 @@ class LanguageManager:
                 'backup_export': 'Export as JSON',
                 'backup_success': 'Backup Successful',
                 'backup_folder': 'Backup Folder',
+                'backup_progress': 'Backing up database... {percent}%',
+                'backup_failed': 'Backup failed: {error}',
+                'auto_backup_done': 'Database backed up automatically: {path}',
+                'template_removed_elsewhere': "Template '{name}' was renamed or deleted by another instance",
+                'mail_merge': 'Mail Merge from CSV...',
+                'mail_merge_output': 'Save the emails as Outlook drafts?\n\nChoose No to export .eml files instead.',
+                'mail_merge_progress': 'Generated {done}, failed {failed}',
+                'mail_merge_done': 'Generated {written} emails ({rate:.0f}/s), {failed} row(s) failed.',
                 
                 # HTML Editor
                 'font': 'Font',
@@ -0,0 +1,317 @@
+"""郵件合併：按 CSV 文件的每一行渲染同一模板
+
+CSV 的列名即變數名，每行生成一封郵件。渲染在進程池中進行，
+結果寫入 .eml 文件（Outlook 可直接打開為草稿），或經單個 COM 線程保存到 Outlook 草稿箱。
+
+用法:
+    python mail_merge.py <事件類型> <模板名稱> <CSV文件> <輸出目錄>
+"""
+import os
+import re
+import csv
+import sys
+import time
+import queue
+import mimetypes
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from email.message import EmailMessage
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from email_renderer import DEFAULT_SIGNATURE, RenderedEmail, render_email
+from template_engine import TemplateCache, _PHOTO_PREFIXES
+
+# 每個任務渲染的行數
+CHUNK_SIZE = 50
+_UNSAFE_FILENAME = re.compile(r'[^\w@.\-]+')
+
+# 進程池中每個工作進程的狀態，由 _init_worker 設置
+_worker_state = {}
+
+
+def read_rows(csv_path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """逐行讀取 CSV，返回 (行號, {列名: 值})；行號從 2 開始，與表格軟件中的行號一致"""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=2):
+            yield row_number, {key.strip(): (value or "").strip() for key, value in row.items() if key}
+
+
+def missing_variables(template: Dict, row: Dict[str, str], require_values: bool = False) -> List[str]:
+    """模板中在 CSV 裡沒有對應列的變數（圖片佔位符除外）
+
+    空白的單元格默認視為有意留空，require_values 為 True 時也算缺少。
+    """
+    return [name for name in template.get("variables") or []
+            if not name.startswith(_PHOTO_PREFIXES)
+            and (name not in row or (require_values and not row[name]))]
+
+
+def build_eml(rendered: RenderedEmail) -> bytes:
+    """把渲染結果轉為 .eml 內容，帶 X-Unsent 頭時 Outlook 會作為草稿打開
+
+    正文中的 cid:文件名 引用對應附件的 Content-ID。
+    """
+    message = EmailMessage()
+    message["Subject"] = rendered.subject
+    message["To"] = rendered.to
+    if rendered.cc:
+        message["Cc"] = rendered.cc
+    message["X-Unsent"] = "1"
+    if not rendered.is_html:
+        message.set_content(rendered.text_body or "")
+        return message.as_bytes()
+
+    message.set_content(rendered.html_body, subtype="html")
+    if rendered.attachments:
+        html_part = message.get_payload()[0] if message.is_multipart() else message
+        for image_path in rendered.attachments:
+            filename = os.path.basename(image_path)
+            maintype, subtype = (mimetypes.guess_type(filename)[0] or "image/png").split("/")
+            with open(image_path, 'rb') as f:
+                html_part.add_related(f.read(), maintype=maintype, subtype=subtype,
+                                      cid=f"<{filename}>", filename=filename)
+    return message.as_bytes()
+
+
+def _init_worker(template: Dict, signature: str, output_format: str, require_values: bool):
+    _worker_state.update(template=template, signature=signature, output_format=output_format,
+                         require_values=require_values, cache=TemplateCache(max_size=1))
+
+
+def _render_chunk(rows: List[Tuple[int, Dict[str, str]]]) -> List[Tuple[int, object, Optional[str]]]:
+    """在工作進程中渲染一批行，返回 [(行號, 結果, 錯誤)]；eml 格式的結果為文件內容"""
+    template = _worker_state["template"]
+    results = []
+    for row_number, row in rows:
+        missing = missing_variables(template, row, _worker_state["require_values"])
+        if missing:
+            results.append((row_number, None, f"missing values for: {', '.join(missing)}"))
+            continue
+        try:
+            rendered = render_email(template, row, _worker_state["signature"],
+                                    template_cache=_worker_state["cache"])
+            if _worker_state["output_format"] == "eml":
+                results.append((row_number, (rendered.to, build_eml(rendered)), None))
+            else:
+                results.append((row_number, rendered, None))
+        except Exception as e:
+            results.append((row_number, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class EmlWriter:
+    """把每封郵件寫成輸出目錄中的 .eml 文件"""
+
+    output_format = "eml"
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, row_number: int, result: Tuple[str, bytes]):
+        to, content = result
+        name = _UNSAFE_FILENAME.sub("_", to)[:60] or "mail"
+        path = os.path.join(self.output_dir, f"{row_number:05d}_{name}.eml")
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def close(self):
+        pass
+
+
+class OutlookDraftWriter:
+    """經單個 COM 線程把郵件保存到 Outlook 草稿箱
+
+    COM 對象只能在創建它的線程中使用，所有郵件都排隊交給同一線程處理；
+    寫入失敗的行在 close 時返回。
+    """
+
+    output_format = "rendered"
+
+    def __init__(self, sender: Optional[str] = None):
+        self.sender = sender
+        self.errors = []
+        self._queue = queue.Queue(maxsize=200)
+        self._thread = threading.Thread(target=self._run, name="outlook-drafts", daemon=True)
+        self._thread.start()
+
+    def write(self, row_number: int, rendered: RenderedEmail):
+        self._queue.put((row_number, rendered))
+
+    def close(self) -> List[Tuple[int, str]]:
+        """等待隊列中的郵件全部保存，返回 [(行號, 錯誤)]"""
+        self._queue.put(None)
+        self._thread.join()
+        return self.errors
+
+    def _run(self):
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        try:
+            outlook = win32com.client.Dispatch("Outlook.Application")
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                row_number, rendered = item
+                try:
+                    self._save_draft(outlook, rendered)
+                except Exception as e:
+                    self.errors.append((row_number, f"{type(e).__name__}: {e}"))
+        except Exception as e:
+            # Outlook 無法啟動時，剩餘的行全部記為失敗
+            print(f"連接 Outlook 失敗: {e}")
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                self.errors.append((item[0], f"{type(e).__name__}: {e}"))
+        finally:
+            pythoncom.CoUninitialize()
+
+    def _save_draft(self, outlook, rendered: RenderedEmail):
+        mail = outlook.CreateItem(0)
+        mail.To = rendered.to
+        mail.CC = rendered.cc
+        mail.Subject = rendered.subject
+        if rendered.is_html:
+            mail.HTMLBody = rendered.html_body
+        else:
+            mail.Body = rendered.text_body
+        for image_path in rendered.attachments:
+            attachment = mail.Attachments.Add(image_path)
+            # 內容ID與HTML中的src="cid:filename"對應
+            attachment.PropertyAccessor.SetProperty(
+                "http://schemas.microsoft.com/mapi/proptag/0x3712001F", os.path.basename(image_path))
+        if self.sender:
+            mail.SentOnBehalfOfName = self.sender
+        mail.Save()
+
+
+class MailMerge:
+    """用進程池按 CSV 行渲染同一模板，並把結果交給輸出（EmlWriter 或 OutlookDraftWriter）"""
+
+    def __init__(self, template: Dict, signature: str = DEFAULT_SIGNATURE, workers: Optional[int] = None,
+                 chunk_size: int = CHUNK_SIZE, require_values: bool = False):
+        """初始化郵件合併
+
+        Args:
+            template (Dict): 模板，含 subject、to、cc、body、variables，可選 id、content_hash 和 name
+            signature (str): 簽名檔選項，同 render_email
+            workers (int, optional): 工作進程數，默認為 CPU 核數
+            chunk_size (int): 每個任務渲染的行數
+            require_values (bool): 是否把變數值為空白的行也作為失敗，默認只要求 CSV 中有該變數的列
+        """
+        self.template = template
+        self.signature = signature
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.require_values = require_values
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """請求取消，已提交的批次完成後停止"""
+        self._cancel.set()
+
+    def run(self, rows: Iterable[Tuple[int, Dict[str, str]]], writer,
+            progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """執行合併
+
+        Args:
+            rows (Iterable): (行號, 變數值) 序列，通常來自 read_rows
+            writer: EmlWriter 或 OutlookDraftWriter
+            progress_callback (Callable, optional): 進度回調，參數為 (已生成數, 失敗數)，在調用線程中執行
+
+        Returns:
+            Dict: written（生成數）、errors（[(行號, 錯誤)]，按行號排序）、cancelled、
+                elapsed（秒）和 mails_per_second
+        """
+        start = time.perf_counter()
+        written = 0
+        errors = []
+        chunks = _chunks(rows, self.chunk_size)
+        # 最多同時提交 workers * 2 個批次，CSV 邊讀邊渲染
+        max_pending = self.workers * 2
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.template, self.signature, writer.output_format,
+                                               self.require_values)) as pool:
+                pending = {}  # 任務 -> 批次中的行號
+                exhausted = False
+                while True:
+                    while not exhausted and not self._cancel.is_set() and len(pending) < max_pending:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                            continue
+                        row_numbers = [row_number for row_number, _ in chunk]
+                        try:
+                            pending[pool.submit(_render_chunk, chunk)] = row_numbers
+                        except RuntimeError as e:
+                            # 進程池已損壞（BrokenProcessPool），其餘的行逐批記為失敗
+                            errors.extend((row_number, f"{type(e).__name__}: {e}") for row_number in row_numbers)
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        row_numbers = pending.pop(future)
+                        try:
+                            results = future.result()
+                        except Exception as e:
+                            # 工作進程崩潰或結果無法序列化時，整批的行記為失敗，不中斷其他批次
+                            errors.extend((row_number, f"{type(e).__name__}: {e}") for row_number in row_numbers)
+                            continue
+                        for row_number, result, error in results:
+                            if error is not None:
+                                errors.append((row_number, error))
+                                continue
+                            try:
+                                writer.write(row_number, result)
+                                written += 1
+                            except OSError as e:
+                                errors.append((row_number, f"{type(e).__name__}: {e}"))
+                    if progress_callback:
+                        progress_callback(written, len(errors))
+        finally:
+            # 中途出錯時也要關閉輸出，已交給 Outlook 線程的郵件才會保存
+            close_errors = writer.close() or []
+        written -= len(close_errors)
+        errors.extend(close_errors)
+        elapsed = time.perf_counter() - start
+        return {
+            "written": written,
+            "errors": sorted(errors),
+            "cancelled": self._cancel.is_set(),
+            "elapsed": elapsed,
+            "mails_per_second": written / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5:
+        print(__doc__)
+        sys.exit(2)
+    from db_manager import DatabaseManager
+
+    event_type, template_name, csv_path, output_dir = sys.argv[1:]
+    template = DatabaseManager().get_template_by_name(event_type, template_name)
+    if not template:
+        print(f"找不到模板: {event_type} / {template_name}")
+        sys.exit(1)
+    result = MailMerge(template).run(read_rows(csv_path), EmlWriter(output_dir))
+    for row_number, error in result["errors"]:
+        print(f"第 {row_number} 行: {error}")
+    print(f"生成 {result['written']} 封郵件，失敗 {len(result['errors'])} 行，"
+          f"耗時 {result['elapsed']:.2f}s，{result['mails_per_second']:.0f} 封/秒")
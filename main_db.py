@@ -2,6 +2,7 @@ import tkinter as tk
 import sys
 import os
 import time
+import multiprocessing
 from tkinter import messagebox
 from pathlib import Path
 
@@ -14,6 +15,8 @@ sys.path.append(str(current_dir))
 from db_manager import DatabaseManager
 from language_manager import LanguageManager
 from template_manager import TemplateManager
+from backup_service import BackupService
+from memory_replica import ReplicatedDatabaseManager
 from gui.main_window import MainWindow
 import tkinter as tk
 
@@ -24,6 +27,10 @@ def main():
     
     # 创建数据库管理器
     db_manager = DatabaseManager()
+    # 开启内存副本后，界面查询从内存读取，写入仍先保存到磁盘
+    if db_manager.get_setting('memory_replica', '0') == '1':
+        db_manager.close_connection()
+        db_manager = ReplicatedDatabaseManager()
     
     # 创建语言管理器
     language_manager = LanguageManager(db_manager=db_manager)
@@ -60,6 +67,13 @@ def main():
         
         if not last_reminder or (int(current_time) - int(last_reminder)) > 7 * 24 * 60 * 60:  # 7天
             db_manager.save_setting('last_backup_reminder', current_time)
+            # 自动在后台备份到 data/backups，只保留最近几份
+            backup_service = BackupService(
+                db_manager.db_file,
+                keep=int(db_manager.get_setting('backup_keep', '5')),
+                compress=db_manager.get_setting('backup_compress', '0') == '1'
+            )
+            app.start_backup(backup_service)
             messagebox.showinfo(
                 language_manager.get_text("backup_reminder"), 
                 language_manager.get_text("backup_message").format(db_path=db_path)
@@ -75,4 +89,6 @@ def main():
     db_manager.close_connection()
 
 if __name__ == "__main__":
+    # 打包為可執行文件後，郵件合併的工作進程需要此調用
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
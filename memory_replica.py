@@ -0,0 +1,180 @@
+import time
+import sqlite3
+import functools
+import threading
+from typing import Optional
+
+from db_manager import DatabaseManager, prepare_connection
+
+
+# 從內存副本讀取的方法
+REPLICA_READ_METHODS = (
+    "get_event_type_id", "get_event_types", "get_languages", "get_translations",
+    "get_template", "get_template_by_name", "get_templates_for_event", "get_template_summaries",
+    "get_template_names_for_event", "get_template_variables", "get_template_revisions", "get_template_revision",
+    "search_templates_page", "count_search_results", "search_templates",
+    "export_templates", "count_templates",
+    "get_setting", "get_app_info", "get_app_info_translations",
+)
+# 生成器方法：每次取下一項時從內存副本讀取，兩次取值之間不佔用副本
+REPLICA_ITER_METHODS = (
+    "iter_templates",
+)
+# 先寫入磁盤，成功後在副本上以相同參數重放一次的方法
+REPLICA_REPLAY_METHODS = (
+    "add_language", "add_translation", "add_event_type", "delete_event_type",
+    "add_template", "delete_template", "delete_template_by_name", "restore_template_revision",
+    "rename_event_type", "move_template", "rename_template", "rebuild_search_index",
+    "save_setting", "add_app_info_translation",
+)
+# 參數是一次性迭代器或寫入量大的方法，寫入磁盤後重新複製整個副本
+REPLICA_RELOAD_METHODS = (
+    "import_templates", "add_templates_bulk", "merge_templates", "migrate_from_json",
+    "set_pragma_profile",
+)
+
+
+class _ReplicaState(threading.local):
+    """每個線程的狀態：depth 為嵌套調用層數，只有最外層負責切換連接；use_replica 表示當前使用副本"""
+    depth = 0
+    use_replica = False
+
+
+def _read_from_replica(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._replica_state.depth:
+            return method(self, *args, **kwargs)
+        with self._replica_lock:
+            self._replica_state.depth += 1
+            self._replica_state.use_replica = True
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._replica_state.use_replica = False
+                self._replica_state.depth -= 1
+    return wrapper
+
+
+def _iterate_from_replica(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        iterator = method(self, *args, **kwargs)
+        # 生成器在第一次取值時才執行查詢，游標綁定在當時的副本連接上，之後每一步都在副本鎖內讀取
+        step = _read_from_replica(lambda self: next(iterator, _END))
+        while True:
+            item = step(self)
+            if item is _END:
+                return
+            yield item
+    return wrapper
+
+
+_END = object()
+
+
+def _write_then_replay(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._replica_state.depth:
+            return method(self, *args, **kwargs)
+        # 寫入和重放期間持有副本鎖，多個線程寫入時副本的修改順序與磁盤一致
+        with self._replica_lock:
+            self._replica_state.depth += 1
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                self._replica_state.depth -= 1
+            # 重放時不再執行文件改名等外部操作，它們已在寫入磁盤時完成
+            if kwargs.get("before_commit") is not None:
+                kwargs["before_commit"] = None
+                kwargs["on_rollback"] = None
+            self._replica_state.depth += 1
+            self._replica_state.use_replica = True
+            try:
+                replayed = method(self, *args, **kwargs)
+            except sqlite3.Error as e:
+                print(f"內存副本重放 {method.__name__} 失敗: {e}")
+                replayed = None
+            finally:
+                self._replica_state.use_replica = False
+                self._replica_state.depth -= 1
+            if replayed != result:
+                # 副本與磁盤結果不一致，重新複製
+                self._load_replica()
+        return result
+    return wrapper
+
+
+def _write_then_reload(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._replica_state.depth:
+            return method(self, *args, **kwargs)
+        with self._replica_lock:
+            self._replica_state.depth += 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._replica_state.depth -= 1
+                self._load_replica()
+    return wrapper
+
+
+class ReplicatedDatabaseManager(DatabaseManager):
+    """帶內存副本的數據庫管理器
+
+    啟動時用 SQLite 備份接口把整個數據庫複製到內存，界面上的查詢都從內存副本讀取，不訪問磁盤。
+    寫入先提交到磁盤，再在副本上以相同參數重放；批量寫入後重新複製整個副本。
+    重放時 updated_at 等時間戳由副本重新生成，與磁盤上的值可能相差幾毫秒。
+    副本只有一個連接，各線程的讀取依次執行。
+    """
+
+    def __init__(self, db_file: str = 'data/app.db', max_connections: int = 8,
+                 pragma_profile: Optional[str] = None):
+        self._replica = None
+        self._replica_lock = threading.RLock()
+        self._replica_state = _ReplicaState()
+        super().__init__(db_file, max_connections=max_connections, pragma_profile=pragma_profile)
+        with self._replica_lock:
+            self._load_replica()
+
+    def get_connection(self):
+        """讀取方法中返回內存副本的連接，其餘情況返回當前線程的磁盤連接"""
+        if getattr(self._replica_state, "use_replica", False) and self._replica is not None:
+            return self._replica
+        return super().get_connection()
+
+    def close_connection(self):
+        """關閉磁盤連接和內存副本"""
+        super().close_connection()
+        with self._replica_lock:
+            if self._replica is not None:
+                self._replica.close()
+                self._replica = None
+
+    def refresh_caches(self):
+        """數據庫被其他進程修改後重新複製內存副本"""
+        super().refresh_caches()
+        with self._replica_lock:
+            self._load_replica()
+
+    def _load_replica(self):
+        """從磁盤複製整個數據庫到新的內存副本（調用方需持有 _replica_lock）"""
+        start = time.perf_counter()
+        replica = sqlite3.connect(":memory:", check_same_thread=False)
+        super().get_connection().backup(replica)
+        prepare_connection(replica)
+        # 不主動關閉舊副本：進行中的 iter_templates 游標仍引用它，迭代結束後隨游標一起釋放
+        self._replica = replica
+        print(f"內存副本已加載，耗時 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+for _name in REPLICA_READ_METHODS:
+    setattr(ReplicatedDatabaseManager, _name, _read_from_replica(getattr(DatabaseManager, _name)))
+for _name in REPLICA_ITER_METHODS:
+    setattr(ReplicatedDatabaseManager, _name, _iterate_from_replica(getattr(DatabaseManager, _name)))
+for _name in REPLICA_REPLAY_METHODS:
+    setattr(ReplicatedDatabaseManager, _name, _write_then_replay(getattr(DatabaseManager, _name)))
+for _name in REPLICA_RELOAD_METHODS:
+    setattr(ReplicatedDatabaseManager, _name, _write_then_reload(getattr(DatabaseManager, _name)))
@@ -0,0 +1,83 @@
+"""PRAGMA 配置性能測試
+
+對 PRAGMA_PROFILES 中的每個配置，在臨時數據庫上填充模板後
+測量保存模板（add_template，每次一個事務）和分頁搜索的延遲。
+臨時目錄位於內存文件系統時 fsync 幾乎沒有開銷，保存延遲的差距會被低估，
+可用 TMPDIR 指定實際磁盤上的目錄。
+
+用法:
+    python profile_benchmark.py [模板數量]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from typing import List
+
+from db_manager import DatabaseManager, PRAGMA_PROFILES
+from query_plan_checker import seed_database
+
+SAVES = 300
+SEARCHES = 100
+# 保存的正文大小約 20 KB
+BODY = "<html><body>" + "<p>Incident at {Location}, reference {ID}.</p>" * 450 + "</body></html>"
+
+
+def _percentiles(timings: List[float]) -> str:
+    timings = sorted(timings)
+    median = timings[len(timings) // 2]
+    p95 = timings[int(len(timings) * 0.95)]
+    return f"{median:>9.2f} {p95:>9.2f}"
+
+
+def run_saves(db_manager: DatabaseManager) -> List[float]:
+    """輪流修改同一事件類型下的模板，返回每次保存的耗時（毫秒）"""
+    event_type_id = db_manager.get_event_type_id("Event Type 0")
+    timings = []
+    for i in range(SAVES):
+        start = time.perf_counter()
+        db_manager.add_template(event_type_id, f"Template 0-{i % 20}", "team@example.com", "",
+                                f"Incident {i} at {{Location}}", f"{BODY}<!-- {i} -->", ["Location", "ID"],
+                                "", "", "sender@example.com")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_searches(db_manager: DatabaseManager) -> List[float]:
+    """分頁搜索，返回每次搜索的耗時（毫秒）"""
+    timings = []
+    for i in range(SEARCHES):
+        start = time.perf_counter()
+        db_manager.search_templates_page(f"incident {i % 50}", columns=["name", "event_type"], limit=50)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_benchmark(template_count: int = 10000):
+    """對每個配置分別測試
+
+    Args:
+        template_count (int): 填充的模板數量
+    """
+    print(f"模板數量 {template_count}，保存 {SAVES} 次，搜索 {SEARCHES} 次，單位 ms\n")
+    print(f"{'profile':<12} {'journal':>8} {'save p50':>9} {'save p95':>9} {'find p50':>9} {'find p95':>9}")
+    for profile in PRAGMA_PROFILES:
+        temp_dir = tempfile.mkdtemp(prefix="profile_benchmark_")
+        db_manager = DatabaseManager(os.path.join(temp_dir, "app.db"))
+        try:
+            # 與用戶在設置中切換一樣應用，日誌模式保存在數據庫文件中
+            db_manager.set_pragma_profile(profile)
+            seed_database(db_manager, template_count)
+            saves = run_saves(db_manager)
+            searches = run_searches(db_manager)
+            journal_mode = db_manager.get_connection().execute("PRAGMA journal_mode").fetchone()[0]
+            print(f"{profile:<12} {journal_mode:>8} {_percentiles(saves)} {_percentiles(searches)}")
+        finally:
+            db_manager.close_connection()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run_benchmark(count)
@@ -0,0 +1,190 @@
+"""查詢計劃回歸檢查
+
+在填充了大量模板的臨時數據庫上調用 DatabaseManager 的各個查詢方法，
+記錄它們實際發出的SQL語句，對每條語句執行 EXPLAIN QUERY PLAN，
+並報告每個方法的耗時。若有語句對大表做全表掃描（SCAN）則以非零狀態退出。
+
+用法:
+    python query_plan_checker.py [模板數量]
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Set
+
+from db_manager import DatabaseManager
+
+# 在實際數據中會變大的表，對它們的全表掃描視為回歸
+LARGE_TABLES = {"templates", "template_variables", "template_bodies"}
+
+# 只統計這些語句，事務控制、PRAGMA 和內部語句（以 -- 開頭）不檢查
+_CHECKED_STATEMENT = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_SCAN_DETAIL = re.compile(r'^SCAN (\w+)(.*)$')
+_SQL_KEYWORDS = {"on", "where", "join", "cross", "inner", "left", "order", "group", "limit",
+                 "set", "values", "using", "as", "select"}
+
+EVENT_TYPE_COUNT = 20
+VARIABLES_PER_TEMPLATE = 3
+TIMING_RUNS = 5
+
+
+def build_template_records(template_count: int, revision: int = 0) -> List[Dict]:
+    """生成測試模板記錄（含 event_type 鍵，與 iter_templates 格式相同），平均分佈在 EVENT_TYPE_COUNT 個事件類型中
+
+    Args:
+        template_count (int): 模板數量
+        revision (int): 不為 0 時寫入主題和正文，內容隨之不同，用於測試更新
+    """
+    per_event_type = max(1, template_count // EVENT_TYPE_COUNT)
+    suffix = f" (r{revision})" if revision else ""
+    records = []
+    for e in range(EVENT_TYPE_COUNT):
+        for i in range(per_event_type):
+            records.append({
+                "event_type": f"Event Type {e}",
+                "name": f"Template {e}-{i}",
+                "to": f"team{i % 50}@example.com",
+                "cc": "ops@example.com",
+                "subject": f"Incident {i} at {{Location}} - {{ID}}{suffix}",
+                "body": (f"<html><body><p>Dear Team,</p><p>Incident {e}-{i} reported at {{Location}} "
+                         f"for {{Company}}. Reference {{ID}}.{suffix}</p>"
+                         f"<img src=\"data:image/png;base64,{'QUJD' * 64}\"/></body></html>"),
+                "variables": ["ID", "Location", "Company"][:VARIABLES_PER_TEMPLATE],
+                "note_en": f"note {i}",
+                "tag_en": f"tag{i % 10}",
+                "sender": "sender@example.com",
+            })
+    return records
+
+
+def seed_database(db_manager: DatabaseManager, template_count: int):
+    """通過導入接口填充測試數據，確保走與正常保存相同的路徑"""
+    data = {"event_types": []}
+    by_event_type = {}
+    for record in build_template_records(template_count):
+        template = {key: value for key, value in record.items() if key != "event_type"}
+        by_event_type.setdefault(record["event_type"], []).append(template)
+    for name, templates in by_event_type.items():
+        data["event_types"].append({"name": name, "templates": templates})
+    if not db_manager.import_templates(data):
+        raise RuntimeError("Seeding the check database failed")
+
+
+def capture_statements(db_manager: DatabaseManager, action: Callable) -> List[str]:
+    """執行一次操作並記錄當前線程連接上發出的SQL語句（參數已展開）"""
+    statements = []
+    conn = db_manager.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        action()
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if _CHECKED_STATEMENT.match(s)]
+
+
+def find_full_scans(db_manager: DatabaseManager, statement: str, allowed: Set[str]) -> List[str]:
+    """返回語句查詢計劃中對大表的全表掃描"""
+    aliases = {}
+    for table, alias in _TABLE_ALIAS.findall(statement):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+
+    conn = db_manager.get_connection()
+    violations = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + statement):
+        detail = row[3]
+        match = _SCAN_DETAIL.match(detail)
+        if not match or "VIRTUAL TABLE" in match.group(2):
+            continue
+        table = aliases.get(match.group(1).lower(), match.group(1).lower())
+        if table in LARGE_TABLES and table not in allowed:
+            violations.append(detail)
+    return violations
+
+
+def build_checks(db_manager: DatabaseManager) -> List[Dict]:
+    """要檢查的操作；allow_scan 列出該操作本身就需要讀取全表的表"""
+    event_type = "Event Type 3"
+    template_name = "Template 3-7"
+    return [
+        {"name": "templates by event name", "action": lambda: db_manager.get_templates_for_event(event_type)},
+        {"name": "template summaries", "action": lambda: db_manager.get_template_summaries(event_type)},
+        {"name": "template names", "action": lambda: db_manager.get_template_names_for_event(event_type)},
+        {"name": "template + variables lookup",
+         "action": lambda: db_manager.get_template_by_name(event_type, template_name)},
+        {"name": "search page", "action": lambda: db_manager.search_templates_page("incident 3-7", event_type, ["name"])},
+        {"name": "search count", "action": lambda: db_manager.count_search_results("incident 3-7", event_type)},
+        {"name": "search (all event types)", "action": lambda: db_manager.search_templates("incident 3-7")},
+        {"name": "export", "action": db_manager.export_templates, "allow_scan": {"templates"}},
+        {"name": "streaming export", "action": lambda: sum(1 for _ in db_manager.iter_templates()),
+         "allow_scan": {"templates"}},
+        {"name": "streaming export by event",
+         "action": lambda: sum(1 for _ in db_manager.iter_templates(event_type))},
+        {"name": "merge import (unchanged)",
+         "action": lambda: db_manager.merge_templates(db_manager.iter_templates(event_type))},
+        # 改名和移動後再改回，不影響其他檢查
+        {"name": "rename event type",
+         "action": lambda: (db_manager.rename_event_type(event_type, "Renamed Type"),
+                            db_manager.rename_event_type("Renamed Type", event_type))},
+        {"name": "move template",
+         "action": lambda: (db_manager.move_template(event_type, "Event Type 4", template_name),
+                            db_manager.move_template("Event Type 4", event_type, template_name))},
+        # 刪除放在最後，計時時重複刪除同一模板不影響其他檢查
+        {"name": "delete by name", "action": lambda: db_manager.delete_template_by_name(event_type, template_name)},
+    ]
+
+
+def run_checks(template_count: int = 50000) -> bool:
+    """填充數據庫並執行所有檢查
+
+    Args:
+        template_count (int): 填充的模板數量
+
+    Returns:
+        bool: 沒有發現全表掃描時返回 True
+    """
+    temp_dir = tempfile.mkdtemp(prefix="query_plan_")
+    db_manager = DatabaseManager(os.path.join(temp_dir, "app.db"))
+    try:
+        print(f"填充 {template_count} 個模板...")
+        start = time.perf_counter()
+        seed_database(db_manager, template_count)
+        print(f"填充完成，耗時 {time.perf_counter() - start:.1f}s\n")
+
+        ok = True
+        for check in build_checks(db_manager):
+            statements = capture_statements(db_manager, check["action"])
+
+            timings = []
+            for _ in range(TIMING_RUNS):
+                start = time.perf_counter()
+                check["action"]()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+
+            violations = []
+            for statement in statements:
+                for detail in find_full_scans(db_manager, statement, check.get("allow_scan", set())):
+                    violations.append((statement, detail))
+
+            status = "FAIL" if violations else "ok"
+            print(f"[{status:>4}] {check['name']:<28} {len(statements)} statement(s), "
+                  f"median {timings[len(timings) // 2]:.2f} ms")
+            for statement, detail in violations:
+                ok = False
+                print(f"       {detail}")
+                print(f"       in: {' '.join(statement.split())[:160]}")
+        return ok
+    finally:
+        db_manager.close_connection()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    sys.exit(0 if run_checks(count) else 1)
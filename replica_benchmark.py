@@ -0,0 +1,94 @@
+"""內存副本讀取延遲測試
+
+在臨時數據庫上模擬主窗口的選擇操作：選擇事件類型時讀取模板摘要，
+選擇模板時按名稱讀取完整模板，比較直接讀磁盤與讀內存副本的延遲，
+並測試副本模式下保存模板（寫磁盤後重放到副本）的耗時。
+
+用法:
+    python replica_benchmark.py [模板數量]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from typing import List
+
+from db_manager import DatabaseManager
+from memory_replica import ReplicatedDatabaseManager
+from query_plan_checker import seed_database, EVENT_TYPE_COUNT
+
+SELECTIONS = 2000
+SAVES = 50
+
+
+def _percentiles(timings: List[float]) -> str:
+    timings = sorted(timings)
+    median = timings[len(timings) // 2]
+    p95 = timings[int(len(timings) * 0.95)]
+    return f"{median:>9.3f} {p95:>9.3f}"
+
+
+def run_selections(db_manager: DatabaseManager, per_event_type: int) -> List[float]:
+    """模擬選擇事件類型再選擇模板，返回每次選擇的耗時（毫秒）"""
+    rng = random.Random(1)
+    timings = []
+    for _ in range(SELECTIONS):
+        e = rng.randrange(EVENT_TYPE_COUNT)
+        event_type = f"Event Type {e}"
+        start = time.perf_counter()
+        db_manager.get_template_summaries(event_type)
+        db_manager.get_template_by_name(event_type, f"Template {e}-{rng.randrange(per_event_type)}")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_saves(db_manager: DatabaseManager) -> List[float]:
+    """修改模板主題後保存，返回每次保存的耗時（毫秒）"""
+    timings = []
+    for i in range(SAVES):
+        template = db_manager.get_template_by_name("Event Type 1", f"Template 1-{i}")
+        start = time.perf_counter()
+        db_manager.add_template(
+            template["event_type_id"], template["name"], template.get("to"), template["cc"],
+            f"Edited {i}", template["body"], template["variables"], template["note_en"],
+            template["tag_en"], template["sender"]
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_benchmark(template_count: int = 20000):
+    """分別以磁盤模式和內存副本模式打開同一數據庫並測試
+
+    Args:
+        template_count (int): 填充的模板數量
+    """
+    temp_dir = tempfile.mkdtemp(prefix="replica_benchmark_")
+    db_file = os.path.join(temp_dir, "app.db")
+    per_event_type = max(1, template_count // EVENT_TYPE_COUNT)
+    try:
+        seeder = DatabaseManager(db_file)
+        seed_database(seeder, template_count)
+        seeder.close_connection()
+
+        print(f"{template_count} 個模板，{SELECTIONS} 次選擇，{SAVES} 次保存（毫秒）\n")
+        print(f"{'mode':<10} {'select p50':>10} {'p95':>9} {'save p50':>9} {'p95':>9}")
+        for label, manager_class in (("disk", DatabaseManager), ("replica", ReplicatedDatabaseManager)):
+            db_manager = manager_class(db_file)
+            try:
+                # 預熱，兩種模式都從熱緩存開始比較
+                run_selections(db_manager, per_event_type)
+                selections = run_selections(db_manager, per_event_type)
+                saves = run_saves(db_manager)
+                print(f"{label:<10} {_percentiles(selections)} {_percentiles(saves)}")
+            finally:
+                db_manager.close_connection()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    run_benchmark(count)
@@ -0,0 +1,91 @@
+"""模板讀取往返次數測試
+
+分別在少量和大量模板的臨時數據庫上執行列出模板、搜索和導出，
+用 set_trace_callback 記錄每個操作發出的SQL語句數。變量隨模板行一次取回，
+語句數應與模板數量無關；若大數據庫上的語句數變多則以非零狀態退出。
+
+用法:
+    python roundtrip_benchmark.py [模板數量]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+from db_manager import DatabaseManager
+from query_plan_checker import capture_statements, seed_database
+
+# 作為對照的小數據庫模板數量
+BASELINE_COUNT = 100
+TIMING_RUNS = 3
+
+
+def build_actions(db_manager: DatabaseManager) -> List[Tuple[str, Callable]]:
+    """要測試的讀取操作；搜索關鍵字匹配所有模板，結果數隨模板數量增長"""
+    return [
+        ("templates for event", lambda: db_manager.get_templates_for_event("Event Type 3")),
+        ("search", lambda: db_manager.search_templates("incident")),
+        ("export", db_manager.export_templates),
+    ]
+
+
+def measure(template_count: int) -> Dict[str, Tuple[int, int, float]]:
+    """填充數據庫並測量每個操作
+
+    Args:
+        template_count (int): 填充的模板數量
+
+    Returns:
+        Dict[str, Tuple[int, int, float]]: 操作名稱 -> (語句數, 返回的模板數, 耗時中位數 ms)
+    """
+    temp_dir = tempfile.mkdtemp(prefix="roundtrip_benchmark_")
+    db_manager = DatabaseManager(os.path.join(temp_dir, "app.db"))
+    try:
+        seed_database(db_manager, template_count)
+        results = {}
+        for name, action in build_actions(db_manager):
+            statements = capture_statements(db_manager, action)
+            result = action()
+            rows = sum(len(event_type["templates"]) for event_type in result["event_types"]) \
+                if isinstance(result, dict) else len(result)
+            timings = []
+            for _ in range(TIMING_RUNS):
+                start = time.perf_counter()
+                action()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = (len(statements), rows, sorted(timings)[TIMING_RUNS // 2])
+        return results
+    finally:
+        db_manager.close_connection()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def run_benchmark(template_count: int = 10000) -> bool:
+    """比較小數據庫和大數據庫上的語句數
+
+    Args:
+        template_count (int): 大數據庫的模板數量
+
+    Returns:
+        bool: 所有操作的語句數都不隨模板數量增長時返回 True
+    """
+    baseline = measure(BASELINE_COUNT)
+    large = measure(template_count)
+
+    print(f"\n模板數量 {BASELINE_COUNT} 與 {template_count}，ms 為大數據庫上的耗時中位數")
+    print(f"{'operation':<22} {'rows':>7} {'statements':>11} {'rows':>7} {'statements':>11} {'ms':>9}")
+    ok = True
+    for name, (statements, rows, _) in baseline.items():
+        large_statements, large_rows, elapsed = large[name]
+        constant = large_statements <= statements
+        ok = ok and constant
+        print(f"{name:<22} {rows:>7} {statements:>11} {large_rows:>7} {large_statements:>11} {elapsed:>9.1f}"
+              f"{'' if constant else '  <- grows with template count'}")
+    return ok
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sys.exit(0 if run_benchmark(count) else 1)
@@ -0,0 +1,199 @@
+import os
+import re
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+
+# 簽名檔列表中出現的文件類型；只有 HTML 簽名檔可以合併到郵件正文
+SIGNATURE_EXTENSIONS = ('.htm', '.html', '.rtf')
+_HTML_EXTENSIONS = ('.htm', '.html')
+
+_BODY_PATTERN = re.compile(r'<body[^>]*>(.*?)</body>', re.DOTALL | re.IGNORECASE)
+_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+# Outlook 把簽名檔圖片保存在同目錄的 "<簽名檔名稱>_files" 文件夾中，<img> 和 VML <v:imagedata> 都用 src 引用
+_IMAGE_SRC_PATTERN = re.compile(r'(\bsrc\s*=\s*)(["\'])([^"\']+)\2', re.IGNORECASE)
+
+
+def signature_directory() -> str:
+    """Outlook 簽名檔目錄"""
+    return os.path.join(os.environ.get('APPDATA', ''), 'Microsoft', 'Signatures')
+
+
+@dataclass(frozen=True)
+class SignatureEntry:
+    """解析後的 HTML 簽名檔
+
+    fragment 中對 _files 文件夾內圖片的引用已改為 cid:文件名，images 為這些圖片的路徑，
+    需與郵件一起作為附件添加。
+    """
+    name: str
+    path: str
+    mtime_ns: int
+    fragment: Optional[str]
+    images: Tuple[str, ...] = ()
+
+
+def _decode_signature(data: bytes) -> str:
+    """按 BOM 或 <meta charset> 解碼簽名檔，Outlook 保存的簽名檔通常不是 UTF-8"""
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return data.decode('utf-16')
+    if data.startswith(b'\xef\xbb\xbf'):
+        return data[3:].decode('utf-8', errors='replace')
+    match = _CHARSET_PATTERN.search(data[:4096])
+    if match:
+        try:
+            return data.decode(match.group(1).decode('ascii'), errors='replace')
+        except LookupError:
+            pass
+    return data.decode('utf-8', errors='replace')
+
+
+def parse_signature(name: str, path: str, data: bytes, mtime_ns: int = 0) -> SignatureEntry:
+    """解析簽名檔內容：取出 <body> 中的片段，並把 _files 文件夾中的圖片改為 cid 引用
+
+    Args:
+        name (str): 簽名檔名稱
+        path (str): 簽名檔路徑，用於定位圖片文件夾
+        data (bytes): 文件內容
+        mtime_ns (int): 文件修改時間
+
+    Returns:
+        SignatureEntry: 解析結果，沒有 <body> 時 fragment 為 None
+    """
+    body_match = _BODY_PATTERN.search(_decode_signature(data))
+    if not body_match:
+        return SignatureEntry(name, path, mtime_ns, None)
+
+    directory = os.path.dirname(path)
+    images = {}
+
+    def replace_src(match):
+        src = match.group(3)
+        if ':' in src or src.startswith(('/', '\\')):
+            # http:、cid:、data: 和絕對路徑保持原樣
+            return match.group(0)
+        image_path = os.path.normpath(os.path.join(directory, unquote(src)))
+        if os.path.dirname(image_path).lower() != os.path.join(directory, f"{name}_files").lower() \
+                or not os.path.isfile(image_path):
+            return match.group(0)
+        images.setdefault(image_path, None)
+        quote = match.group(2)
+        return f"{match.group(1)}{quote}cid:{os.path.basename(image_path)}{quote}"
+
+    fragment = _IMAGE_SRC_PATTERN.sub(replace_src, body_match.group(1))
+    return SignatureEntry(name, path, mtime_ns, fragment, tuple(images))
+
+
+class SignatureCache:
+    """Outlook 簽名檔緩存
+
+    目錄只在其修改時間變化（新增、刪除或改名簽名檔）時重新列出；
+    每個簽名檔在首次使用時解析，之後只在文件修改時間變化時重新讀取。
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """初始化緩存
+
+        Args:
+            directory (str, optional): 簽名檔目錄，默認為 Outlook 簽名檔目錄
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._index = {}          # 簽名檔名稱 -> 文件名列表
+        self._index_mtime_ns = None
+        self._entries = {}        # 簽名檔名稱 -> SignatureEntry
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.scans = 0
+        self.load_ms = 0.0
+        self.scan_ms = 0.0
+
+    def _directory(self) -> str:
+        return self.directory or signature_directory()
+
+    def _refresh_index(self) -> Dict[str, List[str]]:
+        """目錄修改時間變化時重新列出簽名檔，調用方需持有鎖"""
+        directory = self._directory()
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            self._index, self._index_mtime_ns = {}, None
+            self._entries.clear()
+            return self._index
+        if mtime_ns == self._index_mtime_ns:
+            return self._index
+
+        start = time.perf_counter()
+        index = {}
+        for entry in os.scandir(directory):
+            base, ext = os.path.splitext(entry.name)
+            if ext.lower() in SIGNATURE_EXTENSIONS and entry.is_file():
+                index.setdefault(base, []).append(entry.name)
+        self._index, self._index_mtime_ns = index, mtime_ns
+        for name in list(self._entries):
+            if name not in index:
+                del self._entries[name]
+        self.scans += 1
+        self.scan_ms += (time.perf_counter() - start) * 1000
+        return index
+
+    def names(self) -> List[str]:
+        """可用的簽名檔名稱（HTML、RTF），按目錄中的順序"""
+        with self._lock:
+            return list(self._refresh_index())
+
+    def get(self, name: str) -> Optional[SignatureEntry]:
+        """獲取解析後的 HTML 簽名檔
+
+        Args:
+            name (str): 簽名檔名稱（不含擴展名）
+
+        Returns:
+            Optional[SignatureEntry]: 簽名檔，不存在或不是 HTML 簽名檔時返回 None
+        """
+        with self._lock:
+            files = self._refresh_index().get(name, [])
+            filename = next((f for f in files if os.path.splitext(f)[1].lower() in _HTML_EXTENSIONS), None)
+            if filename is None:
+                return None
+            path = os.path.join(self._directory(), filename)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                self._entries.pop(name, None)
+                return None
+            cached = self._entries.get(name)
+            if cached is not None and cached.path == path and cached.mtime_ns == mtime_ns:
+                self.hits += 1
+                return cached
+
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                data = f.read()
+            entry = parse_signature(name, path, data, mtime_ns)
+            self._entries[name] = entry
+            if cached is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self.load_ms += (time.perf_counter() - start) * 1000
+            return entry
+
+    def stats(self) -> Dict:
+        """緩存計數
+
+        Returns:
+            Dict: hits/misses/reloads/scans 計數，以及讀取解析和列出目錄的累計耗時 load_ms/scan_ms
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads, "scans": self.scans,
+                    "load_ms": self.load_ms, "scan_ms": self.scan_ms}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index, self._index_mtime_ns = {}, None
@@ -0,0 +1,121 @@
+"""模板渲染速度測試
+
+比較 EmailGenerator 原有的正則替換流程（每次生成郵件都對主題、收件人、抄送和整個正文重新匹配）
+與 template_engine 的編譯渲染：首次渲染包含編譯，之後從緩存讀取編譯結果只做一次拼接。
+同時核對兩種方式的輸出完全一致。
+
+用法:
+    python template_benchmark.py [正文大小MB]
+"""
+import re
+import sys
+import time
+from typing import Dict
+
+from template_engine import TemplateCache
+
+RUNS = 10
+
+
+def render_with_regex(template: Dict, variables: Dict[str, str]) -> Dict[str, str]:
+    """EmailGenerator.generate_email 改用 template_engine 之前的變數替換流程"""
+    body = template.get("body", "")
+
+    def email_to_name(match):
+        email_var = match.group(1)
+        if email_var in variables:
+            email = variables[email_var]
+            name = email.split('@')[0] if '@' in email else email
+            name = name.replace('.', ' ').title()
+            return f"@{name}"
+        return match.group(0)
+
+    body = re.sub(r'@\{([^{}]+)\}', email_to_name, body)
+    variables_dict = dict(variables)
+
+    def replace_all_vars(text):
+        if not text:
+            return ""
+
+        def replace_var(match):
+            var_name = match.group(1)
+            if var_name.startswith('inserted_photo') or var_name.startswith('inserted photo'):
+                return "[圖片]"
+            if var_name in variables_dict:
+                return variables_dict[var_name]
+            return match.group(0)
+        return re.sub(r'\{([^{}]+)\}', replace_var, text)
+
+    subject = replace_all_vars(template.get("subject", ""))
+    to = replace_all_vars(template.get("to", ""))
+    cc = replace_all_vars(template.get("cc", ""))
+    if "<html>" in body.lower():
+        def replace_body_var(match):
+            var_name = match.group(1)
+            if var_name.startswith('inserted_photo') or var_name.startswith('inserted photo'):
+                return match.group(0)
+            if var_name in variables_dict:
+                return variables_dict[var_name]
+            return match.group(0)
+        body = re.sub(r'\{([^{}]+)\}', replace_body_var, body)
+    else:
+        body = replace_all_vars(body)
+    return {"subject": subject, "to": to, "cc": cc, "body": body}
+
+
+def build_template(body_mb: float, html: bool = True) -> Dict:
+    """生成含變數、@提及、圖片佔位符和未填變數的測試模板"""
+    paragraph = ("<p>Dear {Name}, incident {ID} at {Location} was reported by @{Reporter}. "
+                 "Missing value stays as {Unknown}. {inserted_photo1}</p>\n")
+    filler = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20 + "</p>\n"
+    chunk = paragraph + filler
+    count = max(1, int(body_mb * 1024 * 1024 / len(chunk)))
+    body = chunk * count
+    if html:
+        body = f"<html><body>{body}</body></html>"
+    return {
+        "id": 1,
+        "content_hash": "benchmark",
+        "subject": "Incident {ID} at {Location} @{Reporter} {inserted_photo1}",
+        "to": "{Owner}@example.com",
+        "cc": "ops@example.com; {Manager}",
+        "body": body,
+    }
+
+
+def run_benchmark(body_mb: float = 5.0):
+    """分別測試 HTML 和純文本正文
+
+    Args:
+        body_mb (float): 正文大小（MB）
+    """
+    variables = {"Name": "Team", "ID": "INC-42", "Location": "Hong Kong",
+                 "Reporter": "john.doe@example.com", "Owner": "alice", "Manager": "bob@example.com"}
+    print(f"正文 {body_mb} MB，每項 {RUNS} 次，單位 ms\n")
+    print(f"{'body':<6} {'regex':>9} {'compile':>9} {'cached':>9} {'speedup':>8}")
+    for label, html in (("html", True), ("text", False)):
+        template = build_template(body_mb, html)
+        cache = TemplateCache()
+
+        start = time.perf_counter()
+        first = cache.render(template, variables)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        regex_times, cached_times = [], []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            expected = render_with_regex(template, variables)
+            regex_times.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            rendered = cache.render(template, variables)
+            cached_times.append((time.perf_counter() - start) * 1000)
+            if rendered != expected or first != expected:
+                raise AssertionError(f"{label}: compiled output differs from the regex path")
+        regex_ms = sorted(regex_times)[RUNS // 2]
+        cached_ms = sorted(cached_times)[RUNS // 2]
+        print(f"{label:<6} {regex_ms:>9.1f} {compile_ms:>9.1f} {cached_ms:>9.1f} {regex_ms / cached_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    run_benchmark(size)
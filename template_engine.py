@@ -0,0 +1,187 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+# 片段類型
+LITERAL = 0   # 原文
+VARIABLE = 1  # {變數}
+MENTION = 2   # @{變數}，值為電子郵件時顯示為 @Name
+PHOTO = 3     # {inserted_photo...} 圖片佔位符
+
+# {變數}；前一個字符為 @ 時是 @{變數}（正則以 { 開頭才能快速定位匹配）
+_PLACEHOLDER_PATTERN = re.compile(r'\{([^{}]+)\}')
+_PHOTO_PREFIXES = ('inserted_photo', 'inserted photo')
+# 純文本中的圖片佔位符顯示為該文字
+PHOTO_TEXT = "[圖片]"
+
+Segment = Tuple[int, str]
+
+
+def _compile_text(text: Optional[str], mentions: bool = False) -> List[Segment]:
+    """把文本切分為片段列表
+
+    Args:
+        text (str): 模板文本
+        mentions (bool): 是否識別 @{變數}；否則 @ 作為原文，{變數} 照常替換
+    """
+    segments = []
+    position = 0
+    for match in _PLACEHOLDER_PATTERN.finditer(text or ""):
+        start = match.start()
+        mention = mentions and start > position and text[start - 1] == '@'
+        if mention:
+            start -= 1
+        if start > position:
+            segments.append((LITERAL, text[position:start]))
+        name = match.group(1)
+        if mention:
+            segments.append((MENTION, name))
+        elif name.startswith(_PHOTO_PREFIXES):
+            segments.append((PHOTO, name))
+        else:
+            segments.append((VARIABLE, name))
+        position = match.end()
+    if text and position < len(text):
+        segments.append((LITERAL, text[position:]))
+    return segments
+
+
+def mention_name(email: str) -> str:
+    """從電子郵件中提取名字並格式化，例如 john.doe@example.com 轉為 John Doe"""
+    name = email.split('@')[0] if '@' in email else email
+    return name.replace('.', ' ').title()
+
+
+def _placeholder_value(kind: int, name: str, variables: Dict[str, str], keep_photos: bool) -> str:
+    """計算佔位符的替換文本，找不到值的變數保持原樣
+
+    Args:
+        kind (int): VARIABLE、MENTION 或 PHOTO
+        name (str): 變數名
+        variables (Dict[str, str]): 變數值
+        keep_photos (bool): True 時保留圖片佔位符（HTML 正文），否則替換為 PHOTO_TEXT
+    """
+    if kind == VARIABLE:
+        return variables[name] if name in variables else "{" + name + "}"
+    if kind == PHOTO:
+        return "{" + name + "}" if keep_photos else PHOTO_TEXT
+    if name in variables:
+        return "@" + mention_name(variables[name])
+    if name.startswith(_PHOTO_PREFIXES):
+        return "@{" + name + "}" if keep_photos else "@" + PHOTO_TEXT
+    return "@{" + name + "}"
+
+
+class CompiledText:
+    """一段編譯後的文本：原文已放入 parts，佔位符位置按 (類型, 變數名) 分組記錄
+
+    渲染時每個不同的佔位符只計算一次替換文本，填入所有位置後拼接一次。
+    """
+
+    __slots__ = ("parts", "slots")
+
+    def __init__(self, text: Optional[str], mentions: bool = False):
+        segments = _compile_text(text, mentions)
+        self.parts = [value if kind == LITERAL else None for kind, value in segments]
+        self.slots = {}
+        for index, (kind, value) in enumerate(segments):
+            if kind != LITERAL:
+                self.slots.setdefault((kind, value), []).append(index)
+
+    def render(self, variables: Dict[str, str], keep_photos: bool) -> str:
+        parts = list(self.parts)
+        for (kind, name), indexes in self.slots.items():
+            value = _placeholder_value(kind, name, variables, keep_photos)
+            for index in indexes:
+                parts[index] = value
+        return "".join(parts)
+
+
+class CompiledTemplate:
+    """編譯後的模板：主題、收件人、抄送和正文各自編譯一次"""
+
+    __slots__ = ("subject", "to", "cc", "body", "is_html")
+
+    def __init__(self, template: Dict):
+        body = template.get("body", "") or ""
+        self.subject = CompiledText(template.get("subject", ""))
+        self.to = CompiledText(template.get("to", ""))
+        self.cc = CompiledText(template.get("cc", ""))
+        self.body = CompiledText(body, mentions=True)
+        # 替換變數不會增刪 <html> 標記，編譯時判斷一次即可
+        self.is_html = "<html>" in body.lower()
+
+    def render(self, variables: Dict[str, str]) -> Dict[str, str]:
+        """渲染模板
+
+        主題、收件人和抄送中的圖片佔位符替換為 PHOTO_TEXT；HTML 正文中保留圖片佔位符，
+        由圖片處理替換為 cid 引用。正文中的 @{變數} 顯示為郵件地址對應的名字。
+
+        Args:
+            variables (Dict[str, str]): 變數名到值的映射
+
+        Returns:
+            Dict[str, str]: 含 subject、to、cc、body 的字典
+        """
+        return {
+            "subject": self.subject.render(variables, False),
+            "to": self.to.render(variables, False),
+            "cc": self.cc.render(variables, False),
+            "body": self.body.render(variables, self.is_html),
+        }
+
+
+def template_cache_key(template: Dict) -> Tuple:
+    """緩存鍵：(模板ID, 內容哈希)；從數據庫讀取的模板帶 content_hash，否則按內容計算"""
+    content_hash = template.get("content_hash")
+    if not content_hash:
+        digest = hashlib.sha1()
+        for field in ("subject", "to", "cc", "body"):
+            digest.update((template.get(field) or "").encode("utf-8"))
+            digest.update(b"\0")
+        content_hash = digest.hexdigest()
+    return template.get("id"), content_hash
+
+
+class TemplateCache:
+    """按 (模板ID, 內容哈希) 緩存編譯結果的 LRU 緩存，模板內容變化後自動使用新的編譯結果"""
+
+    def __init__(self, max_size: int = 64):
+        """初始化緩存
+
+        Args:
+            max_size (int): 最多保留的編譯模板數量
+        """
+        self.max_size = max_size
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template: Dict) -> CompiledTemplate:
+        """獲取模板的編譯結果，不在緩存中時編譯並加入緩存"""
+        key = template_cache_key(template)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        compiled = CompiledTemplate(template)
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_size:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def render(self, template: Dict, variables: Dict[str, str]) -> Dict[str, str]:
+        """編譯（或從緩存讀取）並渲染模板，參數和返回值同 CompiledTemplate.render"""
+        return self.get(template).render(variables)
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable
 from db_manager import DatabaseManager
 
 class TemplateManager:
@@ -44,40 +44,8 @@ class TemplateManager:
         Returns:
             Optional[Dict]: 模板信息
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """SELECT t.id, t.event_type_id, t.name, t.recipient as recipient, t.cc, t.subject, t.body, t.note_en
-            FROM templates t
-            JOIN event_types et ON t.event_type_id = et.id
-            WHERE et.name = ? AND t.name = ?""",
-            (event_type, template_name)
-        )
-        
-        template = cursor.fetchone()
-        if not template:
-            return None
-            
-        template_dict = dict(template)
-        
-        # 修改键名以匹配预期输出
-        if 'recipient' in template_dict:
-            template_dict['to'] = template_dict['recipient']
-            del template_dict['recipient']
-        
-        # 获取变量
-        cursor.execute(
-            "SELECT variable_name FROM template_variables WHERE template_id = ?",
-            (template_dict['id'],)
-        )
-        
-        template_dict['variables'] = [row[0] for row in cursor.fetchall()]
-        
-        # 添加 note_en 和 note_zh 到返回结果
-        template_dict['note_en'] = template_dict.get('note_en', '')  # 默认值为空字符串
-        
-        return template_dict
+        # 正文存放在 template_bodies 中，由 DatabaseManager 負責讀取和解壓
+        return self.db_manager.get_template_by_name(event_type, template_name)
 
 
     def get_event_types(self) -> List[str]:
@@ -100,6 +68,17 @@ class TemplateManager:
         """
         return self.db_manager.get_templates_for_event(event_type)
     
+    def get_template_summaries(self, event_type: str) -> List[Dict]:
+        """獲取特定事件類型的模板摘要（不含正文），用於列表顯示
+        
+        Args:
+            event_type (str): 事件類型名稱
+            
+        Returns:
+            List[Dict]: 每項包含 id、name、tag_en 和 updated_at
+        """
+        return self.db_manager.get_template_summaries(event_type)
+    
     def get_template_names_for_event(self, event_type: str) -> List[str]:
         """獲取特定事件類型的所有模板名稱
         
@@ -117,6 +96,8 @@ class TemplateManager:
         if template_data:
             # 将数据库中的字段映射到返回的数据结构
             template = {
+                "id": template_data['id'],
+                "content_hash": template_data.get('content_hash'),
                 "name": template_data['name'],
                 "to": template_data['to'],
                 "cc": template_data['cc'],
@@ -188,6 +169,35 @@ class TemplateManager:
         """
         return self.db_manager.search_templates(keyword)
     
+    def search_templates_page(self, keyword: str, event_type: Optional[str] = None,
+                              columns: Optional[List[str]] = None, limit: Optional[int] = 50,
+                              offset: int = 0) -> List[Dict]:
+        """在數據庫中過濾並分頁搜索模板
+        
+        Args:
+            keyword (str): 搜索關鍵字
+            event_type (str, optional): 只搜索該事件類型
+            columns (List[str], optional): 返回的欄位，默認為 id 和 name
+            limit (int, optional): 每頁數量，None 表示不限制
+            offset (int): 跳過的結果數量
+            
+        Returns:
+            List[Dict]: 只含所請求欄位的模板字典
+        """
+        return self.db_manager.search_templates_page(keyword, event_type, columns, limit, offset)
+    
+    def count_search_results(self, keyword: str, event_type: Optional[str] = None) -> int:
+        """統計搜索結果總數
+        
+        Args:
+            keyword (str): 搜索關鍵字
+            event_type (str, optional): 只統計該事件類型
+            
+        Returns:
+            int: 匹配的模板數量
+        """
+        return self.db_manager.count_search_results(keyword, event_type)
+    
     def export_templates(self, filename: str) -> None:
         """將模板導出到JSON文件
         
@@ -199,8 +209,43 @@ class TemplateManager:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(templates_data, f, ensure_ascii=False, indent=2)
     
+    def export_templates_ndjson(self, filename: str, event_type: Optional[str] = None,
+                                tag: Optional[str] = None, compress: Optional[bool] = None,
+                                progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """以每行一個模板的 NDJSON 格式流式導出，不在內存中構建整個模板庫
+        
+        Args:
+            filename (str): 導出文件路徑
+            event_type (str, optional): 只導出該事件類型
+            tag (str, optional): 只導出該標籤的模板
+            compress (bool, optional): 是否使用 gzip 壓縮，None 時根據文件名是否以 .gz 結尾決定
+            progress_callback (Callable, optional): 進度回調，參數為 (已導出數量, 總數)
+            
+        Returns:
+            int: 導出的模板數量
+        """
+        import gzip
+        import json
+        if compress is None:
+            compress = filename.lower().endswith('.gz')
+        total = self.db_manager.count_templates(event_type, tag) if progress_callback else 0
+        
+        opener = gzip.open if compress else open
+        exported = 0
+        with opener(filename, 'wt', encoding='utf-8') as f:
+            for template in self.db_manager.iter_templates(event_type, tag):
+                f.write(json.dumps(template, ensure_ascii=False))
+                f.write("\n")
+                exported += 1
+                if progress_callback and exported % 100 == 0:
+                    progress_callback(exported, total)
+        
+        if progress_callback:
+            progress_callback(exported, total)
+        return exported
+    
     def import_templates(self, filename: str) -> bool:
-        """從JSON文件導入模板
+        """從JSON文件導入模板，替換現有的事件類型和模板（同名模板保留修訂歷史）
         
         Args:
             filename (str): 導入文件路徑
@@ -217,6 +262,61 @@ class TemplateManager:
             print(f"导入失败: {e}")
             return False
     
+    @staticmethod
+    def _read_import_records(filename: str):
+        """逐條讀取導入文件中的模板記錄
+        
+        NDJSON 文件（.ndjson/.jsonl，可帶 .gz）逐行讀取；舊版嵌套 JSON 文件整體解析後展開。
+        
+        Yields:
+            Dict: 含 event_type 和模板欄位的記錄
+        """
+        import gzip
+        import json
+        lower_name = filename.lower()
+        opener = gzip.open if lower_name.endswith('.gz') else open
+        if lower_name.endswith('.gz'):
+            lower_name = lower_name[:-3]
+        
+        with opener(filename, 'rt', encoding='utf-8') as f:
+            if lower_name.endswith(('.ndjson', '.jsonl')):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+                return
+            
+            data = json.load(f)
+        for event_type in data.get("event_types", []):
+            for template in event_type.get("templates", []):
+                record = dict(template)
+                record["event_type"] = event_type["name"]
+                yield record
+    
+    def merge_import_templates(self, filename: str, chunk_size: int = 500,
+                               progress_callback: Optional[Callable[[Dict[str, int]], None]] = None
+                               ) -> Optional[Dict[str, int]]:
+        """以合併模式導入模板，保留現有模板，只新增或更新文件中的模板
+        
+        Args:
+            filename (str): 導入文件路徑（JSON 或 NDJSON，可帶 .gz）
+            chunk_size (int): 每批提交的模板數
+            progress_callback (Callable, optional): 每批提交後以 inserted/updated/skipped 計數回調
+            
+        Returns:
+            Optional[Dict[str, int]]: inserted/updated/skipped 計數，失敗時返回 None（已提交的批次會保留）
+        """
+        import json
+        import sqlite3
+        try:
+            return self.db_manager.merge_templates(
+                self._read_import_records(filename),
+                chunk_size=chunk_size,
+                progress_callback=progress_callback
+            )
+        except (json.JSONDecodeError, FileNotFoundError, OSError, KeyError, sqlite3.Error) as e:
+            print(f"合併導入失敗: {e}")
+            return None
+    
     def migrate_from_json(self, template_file: str = 'data/templates.json') -> bool:
         """从JSON文件迁移模板数据
         
@@ -284,51 +384,108 @@ class TemplateManager:
         # 添加模板到目標事件類型
         return self.add_template(target_event_type, template) is not None
 
-    def move_template_to_event_type(self, source_event_type: str, target_event_type: str, template_name: str) -> bool:
+    def move_template_to_event_type(self, source_event_type: str, target_event_type: str, template_name: str,
+                                    overwrite: bool = False) -> bool:
         """
-        將模板從一個事件類型移動到另一個事件類型
+        將模板從一個事件類型移動到另一個事件類型，模板ID保持不變
         
         Args:
             source_event_type (str): 源事件類型名稱
             target_event_type (str): 目標事件類型名稱
             template_name (str): 模板名稱
+            overwrite (bool): 目標事件類型中已有同名模板時是否覆蓋
             
         Returns:
             bool: 操作是否成功
         """
-        # 首先複製模板
-        if not self.copy_template_to_event_type(source_event_type, target_event_type, template_name):
-            return False
-            
-        # 然後刪除原模板
-        return self.remove_template(source_event_type, template_name)
+        return self.db_manager.move_template(source_event_type, target_event_type, template_name, overwrite)
 
     def rename_event_type(self, old_name: str, new_name: str) -> bool:
         """
-        重命名事件類型
+        重命名事件類型，模板不需要重新寫入
         
         Args:
             old_name (str): 舊事件類型名稱
             new_name (str): 新事件類型名稱
             
         Returns:
-            bool: 操作是否成功
+            bool: 操作是否成功，新名稱已存在時返回 False
         """
-        # 檢查新名稱是否已存在
-        if self.get_event_type_id(new_name):
-            return False
+        return self.db_manager.rename_event_type(old_name, new_name)
+
+    def rename_template(self, event_type: str, old_name: str, new_name: str, overwrite: bool = False) -> bool:
+        """
+        重命名模板，並同步重命名其圖片目錄
+        
+        Args:
+            event_type (str): 事件類型名稱
+            old_name (str): 舊模板名稱
+            new_name (str): 新模板名稱
+            overwrite (bool): 已有同名模板時是否覆蓋
             
-        # 獲取所有模板
-        templates = self.get_templates_for_event(old_name)
+        Returns:
+            bool: 操作是否成功
+        """
+        from image_manager import ImageManager
+        image_manager = ImageManager()
         
-        # 創建新事件類型
-        self.add_event_type(new_name)
+        # 圖片目錄按模板名稱存放，在同一事務提交前改名，改名失敗時回滾數據庫修改；
+        # 提交失敗時把目錄改回原名，模板和圖片保持一致
+        renamed = self.db_manager.rename_template(
+            event_type, old_name, new_name, overwrite,
+            before_commit=lambda: image_manager.rename_template_image_dir(old_name, new_name),
+            on_rollback=lambda: image_manager.undo_rename_template_image_dir(old_name, new_name)
+        )
+        if renamed:
+            image_manager.discard_replaced_image_dir(new_name)
+        return renamed
+
+    def get_template_revisions(self, event_type: str, template_name: str) -> List[Dict]:
+        """
+        獲取模板的修訂記錄
         
-        # 將所有模板複製到新事件類型
-        for template in templates:
-            self.add_template(new_name, template)
+        Args:
+            event_type (str): 事件類型名稱
+            template_name (str): 模板名稱
+            
+        Returns:
+            List[Dict]: 修訂列表，每項含 revision、kind、size 和 created_at
+        """
+        template = self.db_manager.get_template_by_name(event_type, template_name)
+        if not template:
+            return []
+        return self.db_manager.get_template_revisions(template['id'])
+
+    def get_template_revision(self, event_type: str, template_name: str, revision: int) -> Optional[Dict]:
+        """
+        獲取模板某個修訂的內容
         
-        # 刪除舊事件類型（將自動刪除相關模板）
-        self.remove_event_type(old_name)
+        Args:
+            event_type (str): 事件類型名稱
+            template_name (str): 模板名稱
+            revision (int): 修訂號
+            
+        Returns:
+            Optional[Dict]: 修訂內容，不存在時返回 None
+        """
+        template = self.db_manager.get_template_by_name(event_type, template_name)
+        if not template:
+            return None
+        return self.db_manager.get_template_revision(template['id'], revision)
+
+    def restore_template_revision(self, event_type: str, template_name: str, revision: int) -> bool:
+        """
+        把模板恢復到某個修訂
         
-        return True
+        Args:
+            event_type (str): 事件類型名稱
+            template_name (str): 模板名稱
+            revision (int): 修訂號
+            
+        Returns:
+            bool: 操作是否成功
+        """
+        template = self.db_manager.get_template_by_name(event_type, template_name)
+        if not template:
+            return False
+        return self.db_manager.restore_template_revision(template['id'], revision)